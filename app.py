@@ -1,8 +1,22 @@
 import streamlit as st
 import openai
-import PyPDF2
+import httpx
 import json
+import logging
 import os
+import hashlib
+import sqlite3
+import threading
+import time
+import queue
+import asyncio
+import random
+import re
+import functools
+import math
+import copy
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 import io
 from reportlab.lib.pagesizes import letter, A4
@@ -12,6 +26,22 @@ from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
 from dotenv import load_dotenv
+from pdf_extraction import iter_pdf_pages
+from metrics import METRICS, start_metrics_exporters
+from pdf_styles import get_pdf_styles
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
 
 # Configure page
 st.set_page_config(
@@ -244,349 +274,2244 @@ st.markdown("""
 # Load environment variables
 load_dotenv()
 
+# Bump a stage's version whenever its prompt template changes so stale cached responses are not reused
+PROMPT_VERSIONS = {
+    'assess_resume': 2,
+    'generate_skill_questions': 3,
+    'parse_and_improve_resume': 3,
+    'create_ats_optimized_resume': 3,
+    'generate_cover_letter': 2,
+    'regenerate_resume_section': 1,
+}
+
+# Static system prompts. Nothing user-specific may be interpolated into these: they form the
+# identical prefix of every request for a stage, which is what provider prompt caching reuses.
+# OpenAI only caches prefixes of PROMPT_CACHE_MIN_TOKENS or more, and each of these is shorter
+# (about 100-770 tokens), so cached_tokens stays 0 until a stage's static prefix grows past it.
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+ASSESSMENT_SYSTEM_PROMPT = """You are an expert resume reviewer. Analyze the resume supplied by the user and provide a comprehensive assessment.
+
+Please provide:
+1. Overall assessment score (1-10)
+2. Key strengths identified
+3. Areas for improvement
+4. Missing sections or information
+5. Industry-specific skills mentioned
+6. Recommended skills to add
+7. Experience level assessment
+8. Format and presentation feedback
+
+Return the response as a JSON object with the following structure:
+{
+    "overall_score": 0,
+    "strengths": [],
+    "improvements": [],
+    "missing_sections": [],
+    "current_skills": [],
+    "recommended_skills": [],
+    "experience_level": "",
+    "format_feedback": ""
+}"""
+
+ASSESSMENT_WITH_QUESTIONS_SYSTEM_PROMPT = """You are an expert resume reviewer and experienced interviewer. Analyze the resume supplied by the user, provide a comprehensive assessment, and prepare interview questions for the candidate.
+
+Please provide:
+1. Overall assessment score (1-10)
+2. Key strengths identified
+3. Areas for improvement
+4. Missing sections or information
+5. Industry-specific skills mentioned
+6. Recommended skills to add
+7. Experience level assessment
+8. Format and presentation feedback
+9. 10 relevant technical and behavioral interview questions based on the skills found and the experience level
+
+Return the response as a JSON object with the following structure:
+{
+    "overall_score": 0,
+    "strengths": [],
+    "improvements": [],
+    "missing_sections": [],
+    "current_skills": [],
+    "recommended_skills": [],
+    "experience_level": "",
+    "format_feedback": "",
+    "interview_questions": {
+        "questions": [
+            {
+                "question": "Question text here",
+                "type": "technical/behavioral",
+                "skill_area": "relevant skill"
+            }
+        ]
+    }
+}"""
+
+SKILL_QUESTIONS_SYSTEM_PROMPT = """You are an experienced interviewer. Based on the skills and experience level supplied by the user, generate the requested number of relevant technical and behavioral questions.
+
+Return as JSON array with question objects:
+{
+    "questions": [
+        {
+            "question": "Question text here",
+            "type": "technical/behavioral",
+            "skill_area": "relevant skill"
+        }
+    ]
+}"""
+
+RESUME_JSON_SCHEMA = """{
+    "personal_info": {
+        "name": "Full Name",
+        "email": "email@example.com",
+        "phone": "Phone Number",
+        "location": "City, State",
+        "linkedin": "LinkedIn URL (if available)",
+        "portfolio": "Website URL (if available)"
+    },
+    "professional_summary": "2-3 sentence compelling summary with keywords for the target industry and level",
+    "experience": [
+        {
+            "title": "Job Title",
+            "company": "Company Name",
+            "location": "City, State",
+            "duration": "MM/YYYY - MM/YYYY",
+            "achievements": [
+                "• Enhanced achievement with quantified results and strong action verbs",
+                "• Another achievement showing impact and using industry keywords",
+                "• Third achievement demonstrating skills relevant to target role"
+            ]
+        }
+    ],
+    "education": [
+        {
+            "degree": "Degree Type and Major",
+            "institution": "University Name",
+            "location": "City, State",
+            "graduation": "MM/YYYY",
+            "gpa": "GPA (if 3.5+)",
+            "honors": "Relevant honors/awards"
+        }
+    ],
+    "skills": {
+        "technical": ["Priority technical skills for target role"],
+        "tools": ["Industry-relevant tools and platforms"],
+        "languages": ["Programming/spoken languages if relevant"]
+    },
+    "certifications": ["Relevant certifications"],
+    "projects": [
+        {
+            "name": "Project Name",
+            "description": "Description emphasizing technologies and impact with measurable results",
+            "link": "GitHub/Demo link (if available)"
+        }
+    ],
+    "achievements": [
+        "Key career achievements with quantified results",
+        "Awards, recognitions, or notable accomplishments"
+    ]
+}"""
+
+IMPROVE_RESUME_SYSTEM_PROMPT = """You are a professional resume writer. Parse and improve the resume supplied by the user based on the assessment feedback and any additional information provided.
+
+Create an improved, structured resume. Return as JSON with this exact structure:
+""" + RESUME_JSON_SCHEMA + """
+
+Ensure all content is improved with:
+- Strong action verbs (Led, Implemented, Achieved, Optimized, etc.)
+- Quantified results where possible
+- Professional language
+- ATS-friendly formatting
+- Industry-relevant keywords"""
+
+ATS_RESUME_SYSTEM_PROMPT = """You are a professional resume writer specializing in Applicant Tracking Systems. Create an ATS-optimized, professional resume combining the original resume, assessment feedback, and user responses supplied by the user.
+
+Create an ATS-optimized resume with these requirements:
+1. Use industry-specific keywords for the TARGET INDUSTRY given in the user responses
+2. Format for positions at the TARGET LEVEL given in the user responses
+3. Include quantified achievements from user responses
+4. Use strong action verbs and measurable results
+5. Ensure ATS-friendly formatting with clear section headers
+6. Incorporate both existing and recommended skills strategically
+7. Create compelling professional summary targeting the user's objective
+
+Return as JSON with this exact structure:
+""" + RESUME_JSON_SCHEMA + """
+
+CRITICAL ATS OPTIMIZATION REQUIREMENTS:
+- Use exact keywords from target industry and role level
+- Include metrics and numbers wherever possible
+- Use standard section headers (EXPERIENCE, EDUCATION, SKILLS, etc.)
+- Avoid graphics, tables, or complex formatting
+- Front-load important keywords in job descriptions
+- Include both hard and soft skills relevant to target role
+- Ensure 70%+ keyword match for positions in the target industry at the target level"""
+
+SECTION_REWRITE_SYSTEM_PROMPT = """You are a professional resume writer specializing in Applicant Tracking Systems. You are given ONE section of an existing ATS-optimized resume together with the candidate's goals and answers. Rewrite only that section so it reflects the answers.
+
+Requirements:
+- Keep exactly the same JSON shape as the current section (same keys, same list/object structure)
+- Keep facts from the current section unless the answers replace them; never invent employers, dates or degrees
+- Use strong action verbs, quantified results and keywords for the target industry and level
+- Achievement bullets start with "• "
+
+Return as JSON: {"section": <the rewritten section>}"""
+
+COVER_LETTER_SYSTEM_PROMPT = """You are a professional career writer. Create a professional, compelling cover letter based on the resume data, user goals and job details supplied by the user.
+
+Create a cover letter that:
+1. Has a strong opening that grabs attention
+2. Demonstrates knowledge of the company/role (if provided)
+3. Highlights relevant experience and achievements with specific examples
+4. Shows enthusiasm for the target industry and role
+5. Includes a compelling call to action
+6. Is 3-4 paragraphs long
+7. Uses industry-appropriate language and keywords
+8. Shows personality while maintaining professionalism
+
+Format as a complete cover letter with proper structure:
+- Date
+- Recipient (Dear Hiring Manager or specific name if provided)
+- Body paragraphs
+- Professional closing
+- Signature line
+
+Make it compelling and personalized, not generic."""
+
+class PromptBuilder:
+    """Builds chat messages with the static system prompt first and all variable content last"""
+
+    def __init__(self, system_prompt):
+        self.system_prompt = system_prompt
+        self.sections = []
+
+    def add_section(self, title, content):
+        self.sections.append((title, content))
+        return self
+
+    def add_fields(self, title, fields):
+        """Add a section of '- Label: value' lines"""
+        lines = [f"- {label}: {value}" for label, value in fields]
+        return self.add_section(title, "\n".join(lines))
+
+    def build(self):
+        user_content = "\n\n".join(f"{title}:\n{content}" for title, content in self.sections)
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": user_content},
+        ]
+
+    def section_texts(self):
+        """Section name -> text, with the cacheable system prefix under 'system_prefix'"""
+        texts = {"system_prefix": self.system_prompt}
+        for title, content in self.sections:
+            texts[title.lower().replace(' ', '_')] = content
+        return texts
+
+class LLMResponseCache:
+    """Persistent SQLite cache for LLM responses with LRU/TTL eviction and a size cap"""
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(**parts):
+        """Content-addressed key over everything that influences the completion"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached value or None, refreshing its LRU position on a hit"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        """Store a value and evict expired / least recently used entries over the size cap"""
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        expired = self._conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        self.evictions += max(expired, 0)
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM llm_cache ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Hit/miss counters and current footprint"""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+def create_llm_cache():
+    """Build the response cache from environment settings (LLM_CACHE_PATH empty disables it)"""
+    path = os.getenv('LLM_CACHE_PATH', '.llm_cache.sqlite3')
+    if not path:
+        return None
+    try:
+        return LLMResponseCache(
+            path,
+            ttl_seconds=float(os.getenv('LLM_CACHE_TTL_HOURS', '168')) * 3600,
+            max_bytes=int(float(os.getenv('LLM_CACHE_MAX_MB', '64')) * 1024 * 1024)
+        )
+    except (sqlite3.Error, ValueError) as e:
+        logger.warning("LLM response cache disabled: %s", e)
+        return None
+
+class ExtractionCache:
+    """Extracted PDFs keyed by the SHA-256 of the uploaded bytes.
+
+    A bounded in-memory LRU shared by every session, optionally backed by an LLMResponseCache
+    file so results survive restarts. Identical uploads skip parsing entirely, and since they
+    produce identical text the LLM response cache usually hits right after.
+    """
+
+    # Bump when the shape or content of extraction results changes, to ignore older disk entries
+    FORMAT_VERSION = 3
+
+    def __init__(self, max_entries=128, disk=None):
+        self.max_entries = max_entries
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry
+        if self.disk is not None:
+            stored = self.disk.get(f"v{self.FORMAT_VERSION}:{digest}")
+            if stored is not None:
+                entry = json.loads(stored)
+                self._remember(digest, entry)
+                with self._lock:
+                    self.hits += 1
+                return entry
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, digest, entry):
+        self._remember(digest, entry)
+        if self.disk is not None:
+            self.disk.set(f"v{self.FORMAT_VERSION}:{digest}", json.dumps(entry))
+
+    def _remember(self, digest, entry):
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            report = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+        if self.disk is not None:
+            report["disk"] = self.disk.stats()
+        return report
+
+def create_extraction_cache():
+    """In-memory extraction cache, persisted to EXTRACTION_CACHE_PATH when that is set"""
+    disk = None
+    path = os.getenv('EXTRACTION_CACHE_PATH', '')
+    if path:
+        try:
+            disk = LLMResponseCache(
+                path,
+                ttl_seconds=float(os.getenv('EXTRACTION_CACHE_TTL_HOURS', '168')) * 3600,
+                max_bytes=int(float(os.getenv('EXTRACTION_CACHE_MAX_MB', '64')) * 1024 * 1024)
+            )
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning("Extraction disk cache disabled: %s", e)
+    return ExtractionCache(int(os.getenv('EXTRACTION_CACHE_ENTRIES', '128')), disk=disk)
+
+class EventLoopThread:
+    """Runs an asyncio event loop on a daemon thread so synchronous code can submit coroutines to it"""
+
+    def __init__(self, name="llm-event-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and block the calling thread until it finishes"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+_llm_event_loop = None
+_llm_event_loop_lock = threading.Lock()
+
+def get_llm_event_loop():
+    """Process-wide event loop thread shared by every session's LLM calls"""
+    global _llm_event_loop
+    with _llm_event_loop_lock:
+        if _llm_event_loop is None:
+            _llm_event_loop = EventLoopThread()
+        return _llm_event_loop
+
+def create_async_http_client():
+    """Pooled keep-alive HTTP transport for the OpenAI client (HTTP/2 when h2 is installed)"""
+    limits = httpx.Limits(
+        max_connections=int(os.getenv('LLM_HTTP_MAX_CONNECTIONS', '20')),
+        max_keepalive_connections=int(os.getenv('LLM_HTTP_MAX_KEEPALIVE', '10')),
+        keepalive_expiry=float(os.getenv('LLM_HTTP_KEEPALIVE_SECONDS', '60'))
+    )
+    return openai.DefaultAsyncHttpxClient(http2=HTTP2_AVAILABLE, limits=limits)
+
+class TokenBucket:
+    """Continuously refilling token bucket"""
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def delay_for(self, amount):
+        """Seconds until `amount` tokens are available (requests larger than capacity wait for a full bucket)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def sync(self, limit=None, remaining=None):
+        """Align the bucket with the quota the server reports"""
+        self._refill()
+        if limit:
+            self.capacity = float(limit)
+            self.refill_per_second = float(limit) / 60.0
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+
+def parse_reset_duration(value):
+    """Parse OpenAI reset headers such as '1s', '6m0s' or '120ms' into seconds"""
+    if not value:
+        return None
+    total = 0.0
+    for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value):
+        total += float(amount) * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}[unit]
+    return total
+
+class RateLimitScheduler:
+    """Process-wide admission control for OpenAI requests.
+
+    Requests wait in FIFO order until both the requests-per-minute and tokens-per-minute
+    buckets can cover them, the buckets are kept in line with the x-ratelimit-* response
+    headers, and rate-limit / transient errors are retried with jittered exponential backoff.
+    Timeouts (an APIConnectionError subclass that already cost a full request timeout) are
+    retried at most max_timeout_retries times, and no retry starts once max_retry_seconds
+    have passed since the first attempt. Must only be used from the LLM event loop.
+    """
+
+    RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_retries=5, base_delay=1.0, max_delay=30.0,
+                 max_timeout_retries=1, max_retry_seconds=180.0):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.max_retries = max_retries
+        self.max_timeout_retries = max_timeout_retries
+        self.max_retry_seconds = max_retry_seconds
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.retries = 0
+        self.throttled = 0
+        self._admission = asyncio.Lock()
+
+    async def acquire(self, estimated_tokens):
+        """Wait for capacity and reserve it for one request"""
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            async with self._admission:
+                while True:
+                    delay = max(self.requests.delay_for(1), self.tokens.delay_for(estimated_tokens))
+                    if delay <= 0:
+                        break
+                    self.throttled += 1
+                    await asyncio.sleep(delay)
+                self.requests.consume(1)
+                self.tokens.consume(estimated_tokens)
+        finally:
+            self.queue_depth -= 1
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Return over-reserved tokens once the real usage is known"""
+        if actual_tokens is not None and actual_tokens < estimated_tokens:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+
+    def update_from_headers(self, headers):
+        if not headers:
+            return
+
+        def header_int(name):
+            try:
+                return int(headers.get(name))
+            except (TypeError, ValueError):
+                return None
+
+        self.requests.sync(header_int('x-ratelimit-limit-requests'), header_int('x-ratelimit-remaining-requests'))
+        self.tokens.sync(header_int('x-ratelimit-limit-tokens'), header_int('x-ratelimit-remaining-tokens'))
+
+    @staticmethod
+    def reset_hint(headers):
+        """Seconds until the exhausted quota resets: tokens, requests, or the later of both if unknown"""
+        exhausted = [kind for kind in ('requests', 'tokens') if headers.get(f'x-ratelimit-remaining-{kind}') == '0']
+        resets = [parse_reset_duration(headers.get(f'x-ratelimit-reset-{kind}')) for kind in exhausted or ('requests', 'tokens')]
+        return max((reset for reset in resets if reset), default=None)
+
+    def backoff_delay(self, attempt, headers=None):
+        """Full-jitter exponential backoff, never shorter than the server's retry hint"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if headers:
+            hint = None
+            if headers.get('retry-after-ms'):
+                hint = float(headers['retry-after-ms']) / 1000.0
+            elif headers.get('retry-after'):
+                try:
+                    hint = float(headers['retry-after'])
+                except ValueError:
+                    hint = None
+            hint = hint or self.reset_hint(headers)
+            if hint:
+                delay = max(delay, min(hint, self.max_delay))
+        return delay
+
+    async def call(self, make_request, estimated_tokens, stage=None):
+        """Run make_request() (returning a raw OpenAI response) under the rate limits with retries"""
+        attempt = 0
+        timeouts = 0
+        started = time.monotonic()
+        while True:
+            await self.acquire(estimated_tokens)
+            try:
+                raw = await make_request()
+            except self.RETRYABLE_ERRORS as e:
+                headers = getattr(getattr(e, 'response', None), 'headers', None)
+                self.update_from_headers(headers)
+                if isinstance(e, openai.APITimeoutError):
+                    timeouts += 1
+                    if timeouts > self.max_timeout_retries:
+                        raise
+                delay = self.backoff_delay(attempt, headers)
+                if attempt >= self.max_retries or time.monotonic() - started + delay > self.max_retry_seconds:
+                    raise
+                self.retries += 1
+                METRICS.inc('llm_retries_total', stage=stage or 'unknown')
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.update_from_headers(raw.headers)
+            return raw
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "requests_available": round(self.requests.tokens, 1),
+            "tokens_available": round(self.tokens.tokens, 1),
+        }
+
+_rate_limiter = None
+
+def get_rate_limiter():
+    """Process-wide scheduler shared by every ResumeAssessmentSystem call"""
+    global _rate_limiter
+    with _llm_event_loop_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimitScheduler(
+                requests_per_minute=float(os.getenv('OPENAI_RPM_LIMIT', '500')),
+                tokens_per_minute=float(os.getenv('OPENAI_TPM_LIMIT', '40000')),
+                max_retries=int(os.getenv('OPENAI_MAX_RETRIES', '5')),
+                max_timeout_retries=int(os.getenv('OPENAI_MAX_TIMEOUT_RETRIES', '1')),
+                max_retry_seconds=float(os.getenv('OPENAI_MAX_RETRY_SECONDS', '180'))
+            )
+        return _rate_limiter
+
+def estimate_request_tokens(request):
+    """Rough token reservation for a request: ~4 characters per prompt token plus the completion cap"""
+    prompt_chars = sum(len(message['content']) for message in request['messages'])
+    return prompt_chars // 4 + request.get('max_tokens', 1000)
+
+@functools.lru_cache(maxsize=8)
+def _get_encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Encodings are downloaded on first use; fall back to estimates when that is not possible
+        logger.warning("Tokenizer unavailable, using estimated token counts: %s", e)
+        return None
+
+def count_tokens(text, model="gpt-4"):
+    """Count tokens with the model's tokenizer (approximate ~4 characters per token without tiktoken)"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+PAGE_ARTIFACT_PATTERN = re.compile(r'^(page\s*)?\d{1,3}(\s*(of|/)\s*\d{1,3})?$', re.IGNORECASE)
+# A word broken across lines: "develop-" at the end of one line, "ment" starting the next
+HYPHENATED_BREAK_PATTERN = re.compile(r'([A-Za-z]{2,})-$')
+# Page counters inside running headers/footers ("Jane Doe | Page 2", "Resume 2 of 3")
+PAGE_COUNTER_PATTERN = re.compile(r'\bpage\s*\d+(\s*(of|/)\s*\d+)?\b|\b\d+\s*(of|/)\s*\d+$', re.IGNORECASE)
+
+def normalize_resume_text(text):
+    """Collapse whitespace, rejoin hyphenated line breaks, and drop page-number lines,
+    consecutive duplicate lines and repeated bullets"""
+    text = text.replace('\r', '\n').replace('\u00a0', ' ').replace('\t', ' ').replace('\u00ad', '')
+    words = None
+    lines, bullets = [], set()
+    for line in text.split('\n'):
+        line = re.sub(r' {2,}', ' ', line).strip()
+        if PAGE_ARTIFACT_PATTERN.match(line):
+            continue
+        if not line and (not lines or not lines[-1]):
+            continue
+        if line and lines and lines[-1] == line:
+            continue
+        broken = HYPHENATED_BREAK_PATTERN.search(lines[-1]) if lines and line[:1].islower() else None
+        if broken:
+            if words is None:
+                words = set(re.findall(r'[a-z]+', text.lower()))
+            fragment = re.match(r'[a-z]*', line).group()
+            # Only rejoin words the resume spells unbroken elsewhere ("develop-" + "ment"); real
+            # compounds ("cross-" + "functional") keep their hyphen
+            hyphen = '' if (broken.group(1) + fragment).lower() in words else '-'
+            lines[-1] = lines[-1][:-1] + hyphen + line
+            continue
+        if BULLET_PATTERN.match(line) and len(line.split()) > 4:
+            bullet = re.sub(r'\W+', ' ', BULLET_PATTERN.sub('', line)).strip().lower()
+            if bullet in bullets:
+                continue
+            bullets.add(bullet)
+        lines.append(line)
+    return '\n'.join(lines).strip()
+
+def strip_repeated_page_lines(page_texts, edge_lines=3, min_share=0.6):
+    """Drop running headers and footers, keeping the first occurrence unless it is a page counter.
+
+    A line counts as one when it is among the first or last edge_lines non-empty lines of at
+    least min_share of the pages (and at least two). Returns (page_texts, lines_removed).
+    """
+    if len(page_texts) < 2:
+        return list(page_texts), 0
+
+    def edge_keys(text):
+        lines = text.split('\n')
+        filled = [i for i, line in enumerate(lines) if line.strip()]
+        keys = {}
+        for position, indexes in (("top", filled[:edge_lines]), ("bottom", filled[-edge_lines:])):
+            for i in indexes:
+                normalized = PAGE_COUNTER_PATTERN.sub('<page>', re.sub(r'\s+', ' ', lines[i]).strip().lower())
+                if len(normalized) > 1:
+                    keys[i] = (position, normalized)
+        return lines, keys
+
+    pages = [edge_keys(text) for text in page_texts]
+    counts = {}
+    for _, keys in pages:
+        for key in set(keys.values()):
+            counts[key] = counts.get(key, 0) + 1
+    threshold = max(2, math.ceil(len(page_texts) * min_share))
+    repeated = {key for key, count in counts.items() if count >= threshold}
+
+    cleaned, seen, removed = [], set(), 0
+    for lines, keys in pages:
+        kept = []
+        for i, line in enumerate(lines):
+            key = keys.get(i)
+            if key in repeated:
+                if key[1] in seen or '<page>' in key[1]:
+                    removed += 1
+                    continue
+                seen.add(key[1])
+            kept.append(line)
+        cleaned.append('\n'.join(kept))
+    return cleaned, removed
+
+def normalize_extracted_pages(page_texts, model="gpt-4"):
+    """Join a PDF's page texts without running headers/footers and layout noise.
+
+    Returns (text, report); the report says how many lines, characters and tokens were removed
+    compared with the plain page join, i.e. how much smaller every prompt built from it gets.
+    """
+    raw_text = "".join(page + "\n" for page in page_texts)
+    pages, repeated_lines = strip_repeated_page_lines(page_texts)
+    text = normalize_resume_text("\n".join(pages))
+    raw_tokens, tokens = count_tokens(raw_text, model), count_tokens(text, model)
+    return text, {
+        "repeated_lines": repeated_lines,
+        "chars_before": len(raw_text),
+        "chars_removed": len(raw_text) - len(text),
+        "tokens_before": raw_tokens,
+        "tokens_removed": raw_tokens - tokens,
+    }
+
+class TokenBudget:
+    """Fits resume text into a token budget and reports token counts per prompt section.
+
+    One instance is shared by every session, so it holds configuration only: per-request counts
+    are returned to the caller and aggregated into METRICS, which does its own locking.
+    """
+
+    TRUNCATION_NOTE = "[... resume truncated to fit the token budget]"
+
+    def __init__(self, resume_budget, model="gpt-4"):
+        self.resume_budget = resume_budget
+        self.model = model
+
+    def fit_resume(self, resume_text, sections=None, omit=()):
+        """Normalize the resume, leave out the sections named in omit, and fit it to the budget.
+
+        Over budget, sections are kept in SECTION_PRIORITY order (the first one that no longer
+        fits is cut at a line boundary, the rest dropped) and reassembled in document order.
+        """
+        if sections is None:
+            sections = build_section_index(resume_text)
+        parts = [
+            (entry["name"], normalize_resume_text(resume_text[entry["start"]:entry["end"]]).strip('\n'))
+            for entry in sections if entry["name"] not in omit
+        ]
+        parts = [(name, part) for name, part in parts if part]
+        text = '\n'.join(part for _, part in parts)
+        if count_tokens(text, self.model) <= self.resume_budget:
+            return text
+
+        remaining = self.resume_budget - count_tokens(self.TRUNCATION_NOTE, self.model)
+        kept = {}
+        for i in sorted(range(len(parts)), key=lambda i: section_priority(parts[i][0])):
+            part_tokens = count_tokens(parts[i][1] + '\n', self.model)
+            if part_tokens <= remaining:
+                kept[i] = parts[i][1]
+                remaining -= part_tokens
+                continue
+            lines = []
+            for line in parts[i][1].split('\n'):
+                line_tokens = count_tokens(line + '\n', self.model)
+                if line_tokens > remaining:
+                    break
+                lines.append(line)
+                remaining -= line_tokens
+            if lines:
+                kept[i] = '\n'.join(lines)
+            break
+        return '\n'.join([kept[i] for i in sorted(kept)] + [self.TRUNCATION_NOTE])
+
+    def record(self, stage, original_resume, fitted_resume, prompt):
+        """Count pre/post compression resume tokens and per-section tokens of a PromptBuilder.
+
+        Returns this request's counts; only the running totals in METRICS are shared.
+        """
+        sections = {
+            name: count_tokens(text, self.model) for name, text in prompt.section_texts().items()
+        }
+        stats = {
+            "resume_tokens_before": count_tokens(original_resume, self.model),
+            "resume_tokens_after": count_tokens(fitted_resume, self.model),
+            "sections": sections,
+            "prompt_tokens": sum(sections.values()),
+        }
+        METRICS.inc('resume_prompt_tokens_total', stats["resume_tokens_before"], stage=stage, kind='before')
+        METRICS.inc('resume_prompt_tokens_total', stats["resume_tokens_after"], stage=stage, kind='after')
+        return stats
+
+# Per-stage model routing: "models" is a fallback chain tried in order. Override any stage with
+# LLM_ROUTES='{"generate_skill_questions": {"models": ["gpt-4o-mini"], "timeout": 30}}' or a JSON
+# file named by LLM_ROUTES_FILE; a bare model name or list is shorthand for just the chain.
+DEFAULT_MODEL_ROUTES = {
+    'assess_resume': {"models": ["gpt-4"], "timeout": 90, "max_tokens": None},
+    'generate_skill_questions': {"models": ["gpt-4"], "timeout": 60, "max_tokens": None},
+    'parse_and_improve_resume': {"models": ["gpt-4"], "timeout": 120, "max_tokens": 3000},
+    'create_ats_optimized_resume': {"models": ["gpt-4"], "timeout": 120, "max_tokens": 3500},
+    'generate_cover_letter': {"models": ["gpt-4"], "timeout": 90, "max_tokens": 1500},
+    'regenerate_resume_section': {"models": ["gpt-4"], "timeout": 45, "max_tokens": 800},
+}
+
+# USD per 1K (prompt, completion) tokens, matched on the longest model-name prefix
+MODEL_PRICING = {
+    'gpt-4': (0.03, 0.06),
+    'gpt-4-turbo': (0.01, 0.03),
+    'gpt-4o': (0.0025, 0.01),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+}
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    matches = [name for name in MODEL_PRICING if model.startswith(name)]
+    if not matches:
+        return 0.0
+    prompt_price, completion_price = MODEL_PRICING[max(matches, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+class ModelRouter:
+    """Maps each pipeline stage to a model fallback chain and records per-stage latency and cost"""
+
+    def __init__(self, routes, breaker_failures=5, breaker_reset_seconds=30):
+        self.routes = routes
+        self.telemetry = {}
+        self.breaker_failures = breaker_failures
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        routes = copy.deepcopy(DEFAULT_MODEL_ROUTES)
+        overrides = []
+        if os.getenv('LLM_ROUTES_FILE'):
+            with open(os.getenv('LLM_ROUTES_FILE')) as f:
+                overrides.append(json.load(f))
+        if os.getenv('LLM_ROUTES'):
+            overrides.append(json.loads(os.getenv('LLM_ROUTES')))
+        for override in overrides:
+            for stage, route in override.items():
+                if stage not in routes:
+                    raise ValueError(f"Unknown pipeline stage in model routes: {stage}")
+                if not isinstance(route, dict):
+                    route = {"models": route}
+                if isinstance(route.get("models"), str):
+                    route = dict(route, models=[route["models"]])
+                routes[stage].update(route)
+        return cls(
+            routes,
+            breaker_failures=int(os.getenv('LLM_BREAKER_FAILURES', '5')),
+            breaker_reset_seconds=float(os.getenv('LLM_BREAKER_RESET_SECONDS', '30'))
+        )
+
+    def route(self, stage):
+        return self.routes[stage]
+
+    def breaker(self, model):
+        """The circuit breaker shared by every stage that calls this model"""
+        with self._lock:
+            if model not in self.breakers:
+                self.breakers[model] = CircuitBreaker(model, self.breaker_failures, self.breaker_reset_seconds)
+            return self.breakers[model]
+
+    def _stage_stats(self, stage):
+        return self.telemetry.setdefault(stage, {
+            "calls": 0, "failures": 0, "fallbacks": 0,
+            "latency_total": 0.0, "latency_max": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+            "models": {},
+        })
+
+    def record_call(self, stage, model, latency, ok, fallback=False, error=None):
+        METRICS.observe('llm_request_duration_seconds', latency, stage=stage, model=model)
+        if not ok:
+            METRICS.inc('llm_errors_total', stage=stage, model=model)
+        # Unparseable output is the model misbehaving, not the service being unavailable
+        if ok:
+            self.breaker(model).record_success()
+        elif not isinstance(error, ValueError):
+            self.breaker(model).record_failure()
+        with self._lock:
+            stats = self._stage_stats(stage)
+            stats["calls"] += 1
+            stats["failures"] += 0 if ok else 1
+            stats["fallbacks"] += 1 if fallback else 0
+            stats["latency_total"] += latency
+            stats["latency_max"] = max(stats["latency_max"], latency)
+            stats["models"][model] = stats["models"].get(model, 0) + 1
+
+    def record_usage(self, stage, model, usage):
+        if usage is None:
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        METRICS.inc('llm_tokens_total', usage.prompt_tokens or 0, stage=stage, model=model, kind='prompt')
+        METRICS.inc('llm_tokens_total', usage.completion_tokens or 0, stage=stage, model=model, kind='completion')
+        METRICS.inc('llm_tokens_total', getattr(details, 'cached_tokens', None) or 0, stage=stage, model=model, kind='cached')
+        with self._lock:
+            stats = self._stage_stats(stage)
+            stats["prompt_tokens"] += usage.prompt_tokens or 0
+            stats["completion_tokens"] += usage.completion_tokens or 0
+            stats["cost_usd"] += estimate_cost(model, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+
+    def stats(self):
+        with self._lock:
+            report = copy.deepcopy(self.telemetry)
+        for stats in report.values():
+            stats["latency_avg"] = stats["latency_total"] / stats["calls"] if stats["calls"] else 0.0
+        return report
+
+    def breaker_stats(self):
+        with self._lock:
+            breakers = list(self.breakers.values())
+        return {breaker.model: breaker.stats() for breaker in breakers}
+
+class CircuitBreaker:
+    """Stops sending requests to a model after consecutive failures.
+
+    After failure_threshold failures in a row the circuit opens and allow() refuses calls, so
+    sessions fail over immediately instead of each waiting out its own timeout. Once
+    reset_seconds have passed a single probe is let through; its outcome closes or re-opens it.
+    """
+
+    def __init__(self, model, failure_threshold=5, reset_seconds=30):
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = None
+        self.probe_started = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_seconds:
+                return False
+            # A probe that never reported back (e.g. cancelled) does not block the next one forever
+            if self.probe_started is not None and now - self.probe_started < self.reset_seconds:
+                return False
+            self.probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is None and self.failures < self.failure_threshold:
+                return
+            if self.opened_at is None:
+                self.trips += 1
+                METRICS.inc('llm_circuit_trips_total', model=self.model)
+            self.opened_at = time.monotonic()
+            self.probe_started = None
+
+    def stats(self):
+        with self._lock:
+            if self.opened_at is None:
+                state = "closed"
+            elif time.monotonic() - self.opened_at < self.reset_seconds:
+                state = "open"
+            else:
+                state = "half_open"
+            return {"state": state, "consecutive_failures": self.failures, "trips": self.trips}
+
+DEFAULT_HEDGE_BUDGET = float(os.getenv('LLM_HEDGE_BUDGET', '0.05'))
+
+class RequestHedger:
+    """Decides when a slow request gets a duplicate, within a per-stage budget.
+
+    A hedge is sent once a request has run longer than the stage's observed p95 for that model
+    (so about 5% of requests qualify) and only while hedges stay under the stage's
+    "hedge_budget" fraction of its requests. A budget of 0 disables hedging for the stage.
+    """
+
+    def __init__(self, router, quantile=0.95, min_samples=20):
+        self.router = router
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def _counts(self, stage):
+        return self.counts.setdefault(stage, {"requests": 0, "hedged": 0, "hedge_wins": 0})
+
+    def delay(self, stage, model, metric='llm_request_duration_seconds'):
+        """Seconds to wait before hedging this request, or None to never hedge it"""
+        with self._lock:
+            self._counts(stage)["requests"] += 1
+        if self.router.route(stage).get("hedge_budget", DEFAULT_HEDGE_BUDGET) <= 0:
+            return None
+        return METRICS.quantile(metric, self.quantile, min_count=self.min_samples, stage=stage, model=model)
+
+    def try_hedge(self, stage):
+        """Claim budget for one hedge; the first hedge of a stage is always allowed"""
+        budget = self.router.route(stage).get("hedge_budget", DEFAULT_HEDGE_BUDGET)
+        with self._lock:
+            counts = self._counts(stage)
+            if counts["hedged"] + 1 > budget * counts["requests"] + 1:
+                METRICS.inc('llm_hedges_total', stage=stage, outcome='over_budget')
+                return False
+            counts["hedged"] += 1
+        METRICS.inc('llm_hedges_total', stage=stage, outcome='sent')
+        return True
+
+    def record_win(self, stage):
+        with self._lock:
+            self._counts(stage)["hedge_wins"] += 1
+        METRICS.inc('llm_hedges_total', stage=stage, outcome='won')
+
+    def stats(self):
+        with self._lock:
+            return copy.deepcopy(self.counts)
+
+class BroadcastStream:
+    """Fans one upstream sequence of text chunks out to any number of synchronous consumers.
+
+    Every subscriber replays the chunks published so far and then follows new ones, so a late
+    joiner sees the complete text. on_abandon is called if the last subscriber leaves early.
+    """
+
+    def __init__(self, on_abandon=None):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.on_abandon = on_abandon
+        self._cond = threading.Condition()
+
+    def publish(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def subscribe(self):
+        with self._cond:
+            self.subscribers += 1
+        position = 0
+        try:
+            while True:
+                with self._cond:
+                    while position >= len(self.chunks) and not self.done:
+                        self._cond.wait()
+                    batch = self.chunks[position:]
+                    position = len(self.chunks)
+                    if not batch:
+                        if self.error is not None:
+                            raise self.error
+                        return
+                yield from batch
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+                abandoned = self.subscribers == 0 and not self.done
+            if abandoned and self.on_abandon is not None:
+                self.on_abandon()
+
+class SingleFlight:
+    """Coalesces identical concurrent requests (same normalized-input hash) onto one in-flight call"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self.requests = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Run fn() once per key at a time; concurrent callers with the same key share its outcome"""
+        with self._lock:
+            self.requests += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stream(self, key, start):
+        """Subscribe to the in-flight stream for key, calling start(broadcast) if there is none.
+
+        start must begin publishing into the broadcast and return a cancellable future; the
+        upstream is cancelled once every subscriber has gone away.
+        """
+        with self._lock:
+            self.requests += 1
+            broadcast = self._streams.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = BroadcastStream()
+                self._streams[key] = broadcast
+            else:
+                self.coalesced += 1
+
+        if leader:
+            started = start(broadcast)
+
+            def abandon():
+                self._forget_stream(key, broadcast)
+                started.cancel()
+
+            broadcast.on_abandon = abandon
+            started.add_done_callback(lambda _: self._forget_stream(key, broadcast))
+        return broadcast.subscribe()
+
+    def _forget_stream(self, key, broadcast):
+        with self._lock:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
+
+class CompletionStream:
+    """Iterable of text chunks from a streamed completion.
+
+    Consuming it fills in ``text``; a mid-stream failure is recorded in ``error`` instead of
+    raised so the partial text can still be shown, and closing it early marks it cancelled.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.parts = []
+        self.error = None
+        self.completed = False
+        self.cancelled = False
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def __iter__(self):
+        try:
+            for chunk in self._chunks:
+                self.parts.append(chunk)
+                yield chunk
+            self.completed = True
+        except GeneratorExit:
+            self.cancelled = True
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self._chunks.close()
+
+class IncrementalJSONParser:
+    """Parses a JSON document as it streams in and exposes the values completed so far.
+
+    The scanner tracks nesting, strings and object keys one character at a time and remembers
+    the last position where every open value was complete. A snapshot is that prefix with the
+    open containers closed, so half-written strings, numbers and keys are never exposed.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+        self._start = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._expect_key = False
+        self._safe_end = None
+        self._safe_stack = ()
+        self._emitted_end = None
+        self._end = None
+        self.done = False
+
+    def _mark_safe(self, end):
+        self._safe_end = end
+        self._safe_stack = tuple(self._stack)
+
+    def feed(self, chunk):
+        """Consume a chunk; return a new partial snapshot if more of the document is complete"""
+        offset = self._length
+        self._parts.append(chunk)
+        self._length += len(chunk)
+
+        for i, ch in enumerate(chunk):
+            pos = offset + i
+            if self.done:
+                break
+            if self._start is None:
+                # Models sometimes prefix the JSON with prose; skip to the first container
+                if ch in '{[':
+                    self._start = pos
+                    self._stack.append(ch)
+                    self._expect_key = ch == '{'
+                    self._mark_safe(pos + 1)
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if not self._string_is_key:
+                        self._mark_safe(pos + 1)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_is_key = self._stack[-1] == '{' and self._expect_key
+            elif ch in '{[':
+                self._stack.append(ch)
+                self._expect_key = ch == '{'
+                self._mark_safe(pos + 1)
+            elif ch in '}]':
+                self._stack.pop()
+                self._expect_key = False
+                self._mark_safe(pos + 1)
+                if not self._stack:
+                    self._end = pos + 1
+                    self.done = True
+            elif ch == ',':
+                # Whatever preceded the comma (including bare numbers/literals) is complete
+                self._mark_safe(pos)
+                self._expect_key = self._stack[-1] == '{'
+            elif ch == ':':
+                self._expect_key = False
+
+        if self._safe_end is None or self._safe_end == self._emitted_end:
+            return None
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            self._emitted_end = self._safe_end
+        return snapshot
+
+    def snapshot(self):
+        """Parse the longest complete prefix, closing any containers still open"""
+        if self._safe_end is None:
+            return None
+        text = "".join(self._parts)[self._start:self._safe_end].rstrip().rstrip(',')
+        closers = "".join('}' if opener == '{' else ']' for opener in reversed(self._safe_stack))
+        try:
+            return json.loads(text + closers)
+        except ValueError:
+            return None
+
+    def result(self):
+        """Strictly parse the document, ignoring text around it like parse_json_response does.
+
+        Raises ValueError if it is missing, incomplete or invalid.
+        """
+        if self._start is None:
+            raise ValueError("No JSON document found in response")
+        if not self.done:
+            raise ValueError("JSON document in response is incomplete")
+        return json.loads("".join(self._parts)[self._start:self._end])
+
+def parse_json_response(content):
+    """Parse the JSON document in a completion, skipping any prose or code fence around it.
+
+    Uses the same rule as IncrementalJSONParser (the document starts at the first { or [), so
+    a response parses the same whether it was streamed or not.
+    """
+    starts = [index for index in (content.find('{'), content.find('[')) if index >= 0]
+    if not starts:
+        raise ValueError("No JSON document found in response")
+    return json.JSONDecoder().raw_decode(content, min(starts))[0]
+
+class JSONCompletionStream:
+    """Iterable of progressively more complete parsed snapshots of a streamed JSON completion.
+
+    After iteration ``result`` holds the fully parsed document, or an ``{"error": ...}`` dict
+    matching what the non-streaming methods return.
+    """
+
+    def __init__(self, text_stream, error_prefix):
+        self.text_stream = text_stream
+        self.error_prefix = error_prefix
+        self.result = None
+
+    def __iter__(self):
+        parser = IncrementalJSONParser()
+        snapshot = None
+        for chunk in self.text_stream:
+            partial = parser.feed(chunk)
+            if partial is not None:
+                snapshot = partial
+                yield snapshot
+
+        if self.text_stream.error is not None:
+            self.result = {"error": f"{self.error_prefix}: {str(self.text_stream.error)}"}
+            return
+        try:
+            self.result = parser.result()
+        except ValueError as e:
+            self.result = {"error": f"{self.error_prefix}: {str(e)}"}
+            return
+        if self.result != snapshot:
+            yield self.result
+
+METRICS.describe('resume_stage_duration_seconds', 'Wall time of pipeline and render stages')
+METRICS.describe('resume_stage_errors_total', 'Pipeline and render stages that failed')
+METRICS.describe('llm_request_duration_seconds', 'Wall time of individual LLM requests, including retries')
+METRICS.describe('llm_tokens_total', 'Tokens reported in response usage, by kind (prompt, completion, cached)')
+METRICS.describe('llm_retries_total', 'LLM requests retried after rate limiting or transient errors')
+METRICS.describe('llm_errors_total', 'LLM requests that failed after retries')
+METRICS.describe('pdf_page_extract_seconds', 'Text extraction time of individual PDF pages')
+METRICS.describe('pdf_extraction_limits_total', 'PDF extractions cut short (pages, timeout, worker_error) or failed')
+METRICS.describe('resume_prompt_tokens_total', 'Resume tokens before and after fitting to the token budget, by stage')
+METRICS.describe('pdf_normalization_removed_tokens_total', 'Prompt tokens removed from extracted PDFs by text normalization')
+METRICS.describe('llm_first_token_seconds', 'Time from starting a streamed LLM request to its first chunk')
+METRICS.describe('llm_hedges_total', 'Duplicate requests for slow LLM calls, by outcome (sent, won, over_budget)')
+METRICS.describe('llm_circuit_trips_total', 'Times a model\'s circuit breaker opened after consecutive failures')
+
+def instrument_stage(stage, is_error=None):
+    """Record wall time and errors of a stage; streamed results are timed by the LLM layer instead"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                METRICS.inc('resume_stage_errors_total', stage=stage)
+                METRICS.observe('resume_stage_duration_seconds', time.perf_counter() - started, stage=stage)
+                raise
+            if isinstance(result, (CompletionStream, JSONCompletionStream)):
+                return result
+            METRICS.observe('resume_stage_duration_seconds', time.perf_counter() - started, stage=stage)
+            failed = is_error(result) if is_error else isinstance(result, dict) and 'error' in result
+            if failed:
+                METRICS.inc('resume_stage_errors_total', stage=stage)
+            return result
+        return wrapper
+    return decorator
+
+# Which resume sections each form answer feeds; "experience" expands to every experience[i]
+RESUME_SECTION_INPUTS = {
+    'career_objective': ['professional_summary'],
+    'achievements': ['professional_summary', 'experience', 'achievements'],
+    'skills_to_add': ['skills'],
+    'recent_projects': ['projects'],
+    'target_industry': ['professional_summary', 'experience', 'skills'],
+    'target_level': ['professional_summary', 'experience'],
+    'company_size': ['professional_summary'],
+}
+
+SECTION_PATH_PATTERN = re.compile(r'^([a-z_]+)(?:\[(\d+)\])?$')
+
+def get_resume_section(resume, path):
+    """Read a section by path, e.g. 'skills' or 'experience[1]'"""
+    name, index = SECTION_PATH_PATTERN.match(path).groups()
+    value = resume.get(name)
+    if index is not None:
+        return value[int(index)]
+    return value
+
+def set_resume_section(resume, path, value):
+    """Return a copy of the resume with one section replaced"""
+    updated = copy.deepcopy(resume)
+    name, index = SECTION_PATH_PATTERN.match(path).groups()
+    if index is not None:
+        updated[name][int(index)] = value
+    else:
+        updated[name] = value
+    return updated
+
+def affected_resume_sections(old_responses, new_responses, resume):
+    """Section paths whose inputs changed between two sets of form answers"""
+    sections = []
+    for field, targets in RESUME_SECTION_INPUTS.items():
+        if (old_responses.get(field) or '') == (new_responses.get(field) or ''):
+            continue
+        for target in targets:
+            if target == 'experience':
+                paths = [f"experience[{i}]" for i in range(len(resume.get('experience', [])))]
+            else:
+                paths = [target]
+            sections.extend(path for path in paths if path not in sections)
+    return sections
+
+def committed_responses(old_responses, new_responses, resume, failed_paths):
+    """Answers the resume reflects after a partial section update.
+
+    A changed field keeps its old value when any section it feeds failed to regenerate, so the
+    next update compared against these sees it as changed again and retries those sections.
+    """
+    committed = dict(new_responses)
+    for field in RESUME_SECTION_INPUTS:
+        paths = affected_resume_sections(
+            {field: old_responses.get(field)}, {field: new_responses.get(field)}, resume
+        )
+        if any(path in failed_paths for path in paths):
+            committed[field] = old_responses.get(field)
+    return committed
+
+# Local analysis: a deterministic, millisecond-fast stand-in for assess_resume. It fills the same
+# schema from simple heuristics, so it can be shown before the LLM answers and used when it can't.
+RESUME_SECTION_HEADINGS = {
+    'summary': ['summary', 'professional summary', 'profile', 'professional profile', 'objective',
+                'career objective', 'about me'],
+    'experience': ['experience', 'work experience', 'professional experience', 'employment',
+                   'employment history', 'work history', 'career history'],
+    'education': ['education', 'academic background', 'qualifications', 'education and training'],
+    'skills': ['skills', 'technical skills', 'core competencies', 'competencies', 'key skills',
+               'technologies', 'tools and technologies'],
+    'projects': ['projects', 'personal projects', 'key projects', 'selected projects'],
+    'certifications': ['certifications', 'certificates', 'licenses and certifications', 'courses'],
+    'achievements': ['achievements', 'awards', 'honors', 'honors and awards', 'accomplishments'],
+    'interests': ['interests', 'hobbies', 'hobbies and interests', 'personal interests'],
+    'references': ['references', 'referees'],
+}
+SECTION_HEADING_ALIASES = {alias: name for name, names in RESUME_SECTION_HEADINGS.items() for alias in names}
+
+ACTION_VERBS = frozenset("""
+achieved accelerated administered analyzed architected automated boosted built collaborated
+completed conducted consolidated coordinated created cut decreased delivered deployed designed
+developed devised directed drove eliminated enabled engineered established evaluated executed
+expanded facilitated founded generated grew guided headed identified implemented improved
+increased initiated innovated installed integrated introduced launched led maintained managed
+mentored migrated modernized negotiated optimized orchestrated organized oversaw owned partnered
+pioneered planned presented produced programmed published redesigned reduced refactored resolved
+restructured revamped saved scaled secured shipped simplified spearheaded streamlined strengthened
+supervised taught tested trained transformed upgraded
+""".split())
+
+# Canonical skill name -> extra spellings that count as the same skill
+SKILL_DICTIONARY = {
+    'Python': [], 'Java': [], 'JavaScript': ['js'], 'TypeScript': [], 'C++': [], 'C#': [],
+    'Go': ['golang'], 'Rust': [], 'Ruby': [], 'PHP': [], 'Kotlin': [], 'Swift': [], 'Scala': [],
+    'SQL': [], 'PostgreSQL': ['postgres'], 'MySQL': [], 'MongoDB': [], 'Redis': [],
+    'React': ['react.js', 'reactjs'], 'Angular': [], 'Vue': ['vue.js'], 'Node.js': ['nodejs'],
+    'Django': [], 'Flask': [], 'FastAPI': [], 'Spring': ['spring boot'], '.NET': [],
+    'HTML': [], 'CSS': [], 'REST APIs': ['rest api', 'restful'], 'GraphQL': [],
+    'AWS': ['amazon web services'], 'Azure': [], 'GCP': ['google cloud'], 'Docker': [],
+    'Kubernetes': ['k8s'], 'Terraform': [], 'CI/CD': [], 'Jenkins': [], 'Git': [], 'Linux': [],
+    'Machine Learning': [], 'Deep Learning': [], 'TensorFlow': [], 'PyTorch': [],
+    'scikit-learn': ['sklearn'], 'Pandas': [], 'NumPy': [], 'Data Analysis': [], 'Spark': [],
+    'Tableau': [], 'Power BI': [], 'Excel': [], 'Statistics': [], 'NLP': [],
+    'Agile': [], 'Scrum': [], 'Jira': [], 'Project Management': [], 'Product Management': [],
+    'Leadership': [], 'Communication': [], 'Stakeholder Management': [], 'Mentoring': [],
+    'Salesforce': [], 'SEO': [], 'Figma': [], 'UX Design': ['ux'], 'Financial Analysis': [],
+}
+
+# Skills that commonly accompany one another; used to suggest what to add
+RELATED_SKILLS = {
+    'Python': ['Docker', 'SQL', 'AWS'], 'Java': ['Spring', 'Docker', 'Kubernetes'],
+    'JavaScript': ['TypeScript', 'React', 'Node.js'], 'React': ['TypeScript', 'GraphQL'],
+    'Docker': ['Kubernetes', 'CI/CD'], 'AWS': ['Terraform', 'Docker'],
+    'Machine Learning': ['PyTorch', 'scikit-learn', 'SQL'], 'Data Analysis': ['SQL', 'Tableau', 'Pandas'],
+    'SQL': ['Python', 'Tableau'], 'Agile': ['Scrum', 'Jira'], 'Leadership': ['Mentoring', 'Stakeholder Management'],
+}
+
+SKILL_PATTERNS = {
+    skill: re.compile(
+        r'(?<![\w+#.])(?:' + '|'.join(re.escape(name) for name in [skill] + aliases) + r')(?![\w+#])',
+        re.IGNORECASE
+    )
+    for skill, aliases in SKILL_DICTIONARY.items()
+}
+BULLET_PATTERN = re.compile(r'^\s*(?:[•●▪◦‣∙*–-]|\d+[.)])\s+')
+QUANTIFIED_PATTERN = re.compile(
+    r'[$€£]\s?\d|\d\s*%|\b\d+(?:[.,]\d+)?\s*(?:x|k|m|million|billion|users|customers|clients|people|'
+    r'engineers|developers|members|projects|hours|days|weeks|months)\b|\b(?!(?:19|20)\d{2}\b)\d{2,}\b',
+    re.IGNORECASE
+)
+YEAR_PATTERN = re.compile(r'\b(?:19|20)\d{2}\b|\b(?:present|current|now)\b', re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+\.[\w.]+')
+
+# Order in which sections keep their place when a resume is over the token budget
+SECTION_PRIORITY = ['header', 'summary', 'experience', 'skills', 'education', 'projects',
+                    'certifications', 'achievements']
+
+# Sections a stage's prompt does without: rewrites don't carry hobbies or references over
+STAGE_OMITTED_SECTIONS = {
+    'parse_and_improve_resume': ('interests', 'references'),
+    'create_ats_optimized_resume': ('interests', 'references'),
+}
+
+def section_priority(name):
+    return SECTION_PRIORITY.index(name) if name in SECTION_PRIORITY else len(SECTION_PRIORITY)
+
+def build_section_index(text, heading_cues=()):
+    """Split resume text into sections: [{"name", "heading", "start", "end"}] with character offsets.
+
+    A line is a heading when it matches a known alias (Experience, Work History, ...) or, for
+    PDFs, when extraction saw it set larger or in bold capitals (heading_cues). The text before
+    the first heading is the "header"; the entries cover the whole text in order.
+    """
+    cues = {cue.strip().lower() for cue in heading_cues}
+    index = [{"name": "header", "heading": "", "start": 0}]
+    offset, seen_content = 0, False
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        heading = stripped.strip(':').strip().lower()
+        name = SECTION_HEADING_ALIASES.get(heading) if len(heading) < 40 else None
+        # Font cues alone also pick up the candidate's name, so they never start the first section
+        if name is None and seen_content and heading in cues and not re.search(r'[\d@|]', heading):
+            name = re.sub(r'\W+', '_', heading).strip('_') or None
+        if name is not None:
+            index[-1]["end"] = offset
+            index.append({"name": name, "heading": stripped, "start": offset})
+        seen_content = seen_content or bool(stripped)
+        offset += len(line)
+    index[-1]["end"] = len(text)
+    return [entry for entry in index if entry["heading"] or entry["end"] > entry["start"]]
+
+def section_body(text, entry):
+    """Text of a section without its heading line"""
+    body = text[entry["start"]:entry["end"]]
+    return body.split('\n', 1)[1] if entry["heading"] and '\n' in body else ("" if entry["heading"] else body)
+
+def detect_resume_sections(resume_text, sections=None):
+    """Map known section names to the non-empty lines under their heading"""
+    if sections is None:
+        sections = build_section_index(resume_text)
+    detected = {}
+    for entry in sections:
+        if entry["name"] in RESUME_SECTION_HEADINGS:
+            lines = [line.strip() for line in section_body(resume_text, entry).splitlines() if line.strip()]
+            detected.setdefault(entry["name"], []).extend(lines)
+    return detected
+
+def estimate_years_of_experience(text):
+    years = []
+    for match in YEAR_PATTERN.finditer(text):
+        token = match.group(0)
+        years.append(int(token) if token.isdigit() else datetime.now().year)
+    return max(years) - min(years) if years else 0
+
+def analyze_resume_locally(resume_text, sections=None):
+    """Rule-based assessment in the assess_resume schema, tagged with "source": "local" """
+    sections = detect_resume_sections(resume_text, sections)
+    lines = [line.strip() for line in resume_text.splitlines() if line.strip()]
+    bullets = [BULLET_PATTERN.sub('', line) for line in lines if BULLET_PATTERN.match(line)]
+    if not bullets:
+        # Extraction often drops bullet glyphs; fall back to the experience section's lines
+        bullets = [line for line in sections.get('experience', []) if len(line.split()) > 4]
+    quantified = [bullet for bullet in bullets if QUANTIFIED_PATTERN.search(bullet)]
+    action_led = [bullet for bullet in bullets if bullet.split() and bullet.split()[0].lower().strip(',.') in ACTION_VERBS]
+    skills = [skill for skill, pattern in SKILL_PATTERNS.items() if pattern.search(resume_text)]
+    years = estimate_years_of_experience('\n'.join(sections.get('experience', [])) or resume_text)
+    has_contact = bool(EMAIL_PATTERN.search(resume_text))
+    word_count = len(resume_text.split())
+
+    core_sections = ['summary', 'experience', 'education', 'skills']
+    missing = [name for name in core_sections if name not in sections]
+    quantified_ratio = len(quantified) / len(bullets) if bullets else 0.0
+    action_ratio = len(action_led) / len(bullets) if bullets else 0.0
+
+    score = (2.0 + 0.75 * (len(core_sections) - len(missing)) + 2 * quantified_ratio + 2 * action_ratio
+             + (0.5 if has_contact else 0) + (0.5 if 300 <= word_count <= 1000 else 0))
+    # Ratios over a handful of bullets prove little: a short resume, or one missing core
+    # sections, is capped so the instant score does not promise what the full assessment won't
+    coverage = (len(core_sections) - len(missing)) / len(core_sections)
+    score = min(score, 4 + 6 * min(1.0, word_count / 400) * coverage)
+    score = max(1, min(10, round(score)))
+
+    if years < 2:
+        experience_level = "Entry Level"
+    elif years < 5:
+        experience_level = "Mid Level"
+    elif years < 10:
+        experience_level = "Senior Level"
+    else:
+        experience_level = "Lead/Principal"
+
+    strengths, improvements = [], []
+    if quantified_ratio >= 0.4:
+        strengths.append(f"{len(quantified)} of {len(bullets)} bullet points include measurable results")
+    elif bullets:
+        improvements.append(f"Only {len(quantified)} of {len(bullets)} bullet points are quantified; add numbers, percentages or amounts")
+    if action_ratio >= 0.5:
+        strengths.append("Bullet points lead with strong action verbs")
+    elif bullets:
+        improvements.append("Start more bullet points with action verbs such as Led, Built or Improved")
+    if len(skills) >= 8:
+        strengths.append(f"Broad skill set with {len(skills)} recognizable skills")
+    elif len(skills) < 4:
+        improvements.append("List your tools and technologies explicitly so ATS keyword matching finds them")
+    if 'projects' in sections or 'achievements' in sections:
+        strengths.append("Includes dedicated projects or achievements")
+    if not has_contact:
+        improvements.append("Add an email address and other contact details at the top")
+    if word_count < 300:
+        improvements.append("The resume is short; expand on responsibilities and impact")
+    elif word_count > 1000:
+        improvements.append("The resume is long; tighten it to the most relevant one or two pages")
+    improvements.extend(f"Add a {name} section" for name in missing)
+
+    recommended = []
+    for skill in skills:
+        for related in RELATED_SKILLS.get(skill, []):
+            if related not in skills and related not in recommended:
+                recommended.append(related)
+
+    return {
+        "overall_score": score,
+        "strengths": strengths,
+        "improvements": improvements,
+        "missing_sections": [name.title() for name in missing],
+        "current_skills": skills,
+        "recommended_skills": recommended[:5],
+        "experience_level": experience_level,
+        "format_feedback": (
+            f"{word_count} words, {len(sections)} recognized sections, {len(bullets)} bullet points "
+            f"({len(quantified)} quantified, {len(action_led)} starting with an action verb)."
+        ),
+        "source": "local",
+    }
+
+METRICS.describe('assessment_fallbacks_total', 'Assessments served by the local analyzer because the LLM failed')
+
+def with_local_fallback(assessment, resume_text, sections=None):
+    """Replace a failed LLM assessment with the local one (unless LOCAL_ASSESSMENT_FALLBACK=0)"""
+    if "error" not in assessment or os.getenv('LOCAL_ASSESSMENT_FALLBACK', '1') != '1':
+        return assessment
+    METRICS.inc('assessment_fallbacks_total')
+    return {**analyze_resume_locally(resume_text, sections), "fallback_reason": assessment["error"]}
+
 class ResumeAssessmentSystem:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    
+        # All sessions share one async client; calls run on the event loop thread and the
+        # synchronous methods below just wait on their futures
+        self.loop = get_llm_event_loop()
+        self.client = openai.AsyncOpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            http_client=create_async_http_client(),
+            timeout=float(os.getenv('LLM_HTTP_TIMEOUT_SECONDS', '120')),
+            max_retries=0  # Retries are handled by the shared rate limit scheduler
+        )
+        self.rate_limiter = get_rate_limiter()
+        # Leaves room for instructions and the largest completion within GPT-4's 8k context
+        self.token_budget = TokenBudget(int(os.getenv('RESUME_TOKEN_BUDGET', '3000')))
+        self.prompt_cache_stats = {}
+        self.single_flight = SingleFlight()
+        self.router = ModelRouter.from_env()
+        self.hedger = RequestHedger(self.router)
+        self._usage_lock = threading.Lock()
+        self.cache = create_llm_cache()
+        self.extraction_cache = create_extraction_cache()
+
+    def _build_request(self, messages, temperature, max_tokens, model):
+        request = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+        }
+        if max_tokens is not None:
+            request["max_tokens"] = max_tokens
+        return request
+
+    def _request_key(self, stage, messages, temperature, max_tokens, model):
+        """Hash of everything that influences the completion; keys both the cache and single-flight"""
+        return LLMResponseCache.make_key(
+            stage=stage,
+            prompt_version=PROMPT_VERSIONS[stage],
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            messages=messages
+        )
+
+    def _store(self, key, content, parse_json):
+        """Cache a finished completion, skipping JSON responses that do not parse"""
+        if self.cache is None or not content:
+            return
+        if parse_json:
+            try:
+                parse_json_response(content)
+            except ValueError:
+                return
+        self.cache.set(key, content)
+
+    def _cached(self, stage, messages, temperature):
+        """Look up a cached response from any model in the stage's fallback chain"""
+        if self.cache is None:
+            return None
+        route = self.router.route(stage)
+        for model in route["models"]:
+            cached = self.cache.get(self._request_key(stage, messages, temperature, route["max_tokens"], model))
+            if cached is not None:
+                return cached
+        return None
+
+    def _complete(self, stage, messages, temperature, parse_json=True):
+        """Run a chat completion for a stage through the cache, single-flight and its model route"""
+        cached = self._cached(stage, messages, temperature)
+        if cached is not None:
+            return parse_json_response(cached) if parse_json else cached
+
+        route = self.router.route(stage)
+
+        def call():
+            last_error = RuntimeError(f"No model available for {stage}: every circuit breaker is open")
+            for attempt, model in enumerate(route["models"]):
+                if not self.router.breaker(model).allow():
+                    continue
+                request = self._build_request(messages, temperature, route["max_tokens"], model)
+                started = time.perf_counter()
+                try:
+                    content = self.loop.run(self._ahedged_create(stage, request, route["timeout"]))
+                    if parse_json:
+                        parse_json_response(content)
+                except Exception as e:
+                    self.router.record_call(stage, model, time.perf_counter() - started, ok=False,
+                                            fallback=attempt > 0, error=e)
+                    last_error = e
+                    continue
+                self.router.record_call(stage, model, time.perf_counter() - started, ok=True, fallback=attempt > 0)
+                self._store(self._request_key(stage, messages, temperature, route["max_tokens"], model), content, parse_json)
+                return content
+            raise last_error
+
+        # Identical concurrent requests share one call; each caller parses its own copy
+        flight_key = self._request_key(stage, messages, temperature, route["max_tokens"], route["models"][0])
+        content = self.single_flight.do(flight_key, call)
+        return parse_json_response(content) if parse_json else content
+
+    def _stream(self, stage, messages, temperature, parse_json=False):
+        """Stream a completion; identical concurrent streams share one upstream request"""
+        route = self.router.route(stage)
+        flight_key = self._request_key(stage, messages, temperature, route["max_tokens"], route["models"][0])
+
+        def chunks():
+            cached = self._cached(stage, messages, temperature)
+            if cached is not None:
+                yield cached
+                return
+
+            yield from self.single_flight.stream(
+                flight_key,
+                lambda broadcast: self.loop.submit(self._apump(stage, messages, temperature, broadcast, parse_json))
+            )
+
+        return CompletionStream(chunks())
+
+    async def _apump(self, stage, messages, temperature, broadcast, parse_json):
+        """Publish a streamed completion into a broadcast, falling back to the next model until output starts"""
+        route = self.router.route(stage)
+        last_error = RuntimeError(f"No model available for {stage}: every circuit breaker is open")
+        for attempt, model in enumerate(route["models"]):
+            if not self.router.breaker(model).allow():
+                continue
+            request = self._build_request(messages, temperature, route["max_tokens"], model)
+            started = time.perf_counter()
+            parts = []
+            try:
+                async for chunk in self._ahedged_stream(stage, request, route["timeout"]):
+                    parts.append(chunk)
+                    broadcast.publish(chunk)
+            except asyncio.CancelledError:
+                broadcast.finish(RuntimeError("Stream cancelled"))
+                raise
+            except Exception as e:
+                self.router.record_call(stage, model, time.perf_counter() - started, ok=False,
+                                        fallback=attempt > 0, error=e)
+                # Once text has reached consumers a different model cannot take over
+                if parts:
+                    broadcast.finish(e)
+                    return
+                last_error = e
+                continue
+            self.router.record_call(stage, model, time.perf_counter() - started, ok=True, fallback=attempt > 0)
+            broadcast.finish()
+            key = self._request_key(stage, messages, temperature, route["max_tokens"], model)
+            await asyncio.to_thread(self._store, key, "".join(parts), parse_json)
+            return
+        broadcast.finish(last_error)
+
+    def _record_usage(self, stage, model, usage):
+        """Track token usage, cost, and prompt tokens served from the provider's prompt-prefix cache"""
+        if usage is None:
+            return
+        self.router.record_usage(stage, model, usage)
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached_tokens = getattr(details, 'cached_tokens', None) or 0
+        with self._usage_lock:
+            stats = self.prompt_cache_stats.setdefault(
+                stage, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+            )
+            stats["requests"] += 1
+            stats["prompt_tokens"] += usage.prompt_tokens or 0
+            stats["cached_tokens"] += cached_tokens
+
+    async def _acreate(self, stage, request, timeout):
+        estimated = estimate_request_tokens(request)
+        raw = await self.rate_limiter.call(
+            lambda: self.client.chat.completions.with_raw_response.create(timeout=timeout, **request),
+            estimated,
+            stage=stage
+        )
+        response = raw.parse()
+        if response.usage is not None:
+            self.rate_limiter.settle(estimated, response.usage.total_tokens)
+        self._record_usage(stage, request["model"], response.usage)
+        return response.choices[0].message.content
+
+    async def _ahedged_create(self, stage, request, timeout):
+        """_acreate, plus a duplicate request if the first outlives the stage's p95; first answer wins"""
+        delay = self.hedger.delay(stage, request["model"])
+        primary = asyncio.ensure_future(self._acreate(stage, request, timeout))
+        tasks = [primary]
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done and self.hedger.try_hedge(stage):
+                    backup = asyncio.ensure_future(self._acreate(stage, request, timeout))
+                    tasks.append(backup)
+                    pending = {primary, backup}
+                    while pending:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            if task.exception() is None:
+                                if task is backup:
+                                    self.hedger.record_win(stage)
+                                return task.result()
+                    return primary.result()  # Both failed: surface the original request's error
+            return await primary
+        finally:
+            # asyncio.wait never cancels what it waits on, so a caller cancelled mid-wait would
+            # otherwise leave both requests running and holding rate-limiter budget
+            for task in tasks:
+                task.cancel()
+
+    async def _ahedged_stream(self, stage, request, timeout):
+        """_astream, racing a duplicate request when the first chunk is slower than the stage's p95.
+
+        Only the start of the stream is hedged: whichever request yields first is followed to
+        the end and the other is closed.
+        """
+        started = time.perf_counter()
+        delay = self.hedger.delay(stage, request["model"], 'llm_first_token_seconds')
+        primary = self._astream(stage, request, timeout)
+        pending = {asyncio.ensure_future(primary.__anext__()): primary}
+        winner, first_chunk, last_error = None, None, None
+        try:
+            done, _ = await asyncio.wait(set(pending), timeout=delay)
+            if not done and self.hedger.try_hedge(stage):
+                backup = self._astream(stage, request, timeout)
+                pending[asyncio.ensure_future(backup.__anext__())] = backup
+            while pending and winner is None:
+                done, _ = await asyncio.wait(set(pending), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stream = pending.pop(task)
+                    error = task.exception()
+                    if error is None or isinstance(error, StopAsyncIteration):
+                        winner, first_chunk = stream, None if error else task.result()
+                        if stream is not primary:
+                            self.hedger.record_win(stage)
+                        break
+                    last_error = last_error or error
+                    await stream.aclose()
+        finally:
+            for task, stream in pending.items():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await stream.aclose()
+        if winner is None:
+            raise last_error
+
+        METRICS.observe('llm_first_token_seconds', time.perf_counter() - started, stage=stage, model=request["model"])
+        try:
+            if first_chunk is None:
+                return
+            yield first_chunk
+            async for chunk in winner:
+                yield chunk
+        finally:
+            await winner.aclose()
+
+    async def _astream(self, stage, request, timeout):
+        estimated = estimate_request_tokens(request)
+        raw = await self.rate_limiter.call(
+            lambda: self.client.chat.completions.with_raw_response.create(
+                stream=True, stream_options={"include_usage": True}, timeout=timeout, **request
+            ),
+            estimated,
+            stage=stage
+        )
+        response = raw.parse()
+        try:
+            async for chunk in response:
+                if chunk.usage is not None:
+                    self.rate_limiter.settle(estimated, chunk.usage.total_tokens)
+                    self._record_usage(stage, request["model"], chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Release the pooled connection even when the consumer stops early
+            await response.close()
+
     def extract_text_from_pdf(self, file):
-        """Extract text from PDF file"""
+        """Extract text from PDF file (an upload or any binary file object)"""
         try:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+            return self.extract_pdf(file)["text"]
         except Exception as e:
             return f"Error reading PDF: {str(e)}"
+
+    @instrument_stage('extract_text_from_pdf')
+    def extract_pdf(self, file, on_page=None):
+        """Normalized text, section index and per-page metadata of a PDF.
+
+        "text" has running headers/footers, hyphenated line breaks, extra whitespace and
+        repeated bullets removed; "normalization" reports what that saved. Parsing runs in
+        sandboxed worker processes; "warnings" lists any limit (pages, timeout, worker_error)
+        that cut the text short. on_page(pages_read, pages_to_read) is called as each page
+        arrives. Repeat uploads come from the extraction cache, so the returned dict is
+        shared with other sessions and must not be modified.
+        """
+        data = file.getvalue() if hasattr(file, 'getvalue') else file.read()
+        digest = ExtractionCache.digest(data)
+        cached = self.extraction_cache.get(digest)
+        if cached is not None:
+            return cached
+
+        result = {}
+        page_texts, pages, heading_cues = [], [], []
+        try:
+            for _, page_text, seconds, page_headings in iter_pdf_pages(data, summary=result):
+                METRICS.observe('pdf_page_extract_seconds', seconds)
+                page_texts.append(page_text)
+                pages.append({"chars": len(page_text), "seconds": round(seconds, 4)})
+                heading_cues.extend(page_headings)
+                if on_page is not None:
+                    on_page(len(pages), result["pages_to_read"])
+        except Exception:
+            METRICS.inc('pdf_extraction_limits_total', limit='failed')
+            raise
+        for warning in result["warnings"]:
+            METRICS.inc('pdf_extraction_limits_total', limit=warning["limit"])
+        text, normalization = normalize_extracted_pages(page_texts, self.token_budget.model)
+        METRICS.inc('pdf_normalization_removed_tokens_total', normalization["tokens_removed"])
+        extraction = {
+            "digest": digest,
+            "text": text,
+            "normalization": normalization,
+            "sections": build_section_index(text, heading_cues),
+            "pages": pages,
+            "page_count": result["page_count"],
+            "warnings": result["warnings"],
+        }
+        # A timeout may be down to load at the time, so only deterministic results are reused
+        if not any(warning["limit"] == "timeout" for warning in result["warnings"]):
+            self.extraction_cache.set(digest, extraction)
+        return extraction
     
-    def assess_resume(self, resume_text):
-        """Analyze resume and provide comprehensive assessment"""
-        prompt = f"""
-        Analyze the following resume and provide a comprehensive assessment:
-
-        Resume Text:
-        {resume_text}
-
-        Please provide:
-        1. Overall assessment score (1-10)
-        2. Key strengths identified
-        3. Areas for improvement
-        4. Missing sections or information
-        5. Industry-specific skills mentioned
-        6. Recommended skills to add
-        7. Experience level assessment
-        8. Format and presentation feedback
-
-        Return the response as a JSON object with the following structure:
-        {{
-            "overall_score": 0,
-            "strengths": [],
-            "improvements": [],
-            "missing_sections": [],
-            "current_skills": [],
-            "recommended_skills": [],
-            "experience_level": "",
-            "format_feedback": ""
-        }}
+    @instrument_stage('assess_resume')
+    def assess_resume(self, resume_text, stream=False, include_questions=False, sections=None):
+        """Analyze resume and provide comprehensive assessment (a JSONCompletionStream when stream=True).
+
+        With include_questions=True the same response also carries an "interview_questions" set
+        for the skills found, saving a separate generate_skill_questions round trip. sections is
+        the extraction's section index; without it one is built from the text.
         """
+        fitted_resume = self.token_budget.fit_resume(resume_text, sections)
+        system_prompt = ASSESSMENT_WITH_QUESTIONS_SYSTEM_PROMPT if include_questions else ASSESSMENT_SYSTEM_PROMPT
+        prompt = PromptBuilder(system_prompt).add_section("Resume Text", fitted_resume)
+        self.token_budget.record("assess_resume", resume_text, fitted_resume, prompt)
+        messages = prompt.build()
         
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
+        if stream:
+            return JSONCompletionStream(
+                self._stream("assess_resume", messages, temperature=0.3, parse_json=True),
+                "Assessment failed"
             )
-            
-            result = json.loads(response.choices[0].message.content)
+
+        try:
+            result = self._complete("assess_resume", messages, temperature=0.3)
             return result
         except Exception as e:
-            return {"error": f"Assessment failed: {str(e)}"}
+            return with_local_fallback({"error": f"Assessment failed: {str(e)}"}, resume_text, sections)
     
-    def generate_skill_questions(self, skills, experience_level):
+    @instrument_stage('generate_skill_questions')
+    def generate_skill_questions(self, skills, experience_level, count=10):
         """Generate skill-based interview questions"""
-        prompt = f"""
-        Based on the following skills and experience level, generate 10 relevant technical and behavioral questions:
-        
-        Skills: {', '.join(skills)}
-        Experience Level: {experience_level}
-        
-        Return as JSON array with question objects:
-        {{
-            "questions": [
-                {{
-                    "question": "Question text here",
-                    "type": "technical/behavioral",
-                    "skill_area": "relevant skill"
-                }}
-            ]
-        }}
-        """
+        messages = PromptBuilder(SKILL_QUESTIONS_SYSTEM_PROMPT).add_fields("Candidate", [
+            ("Skills", ', '.join(skills)),
+            ("Experience Level", experience_level),
+            ("Number of Questions", count),
+        ]).build()
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.5
-            )
-            
-            result = json.loads(response.choices[0].message.content)
+            result = self._complete("generate_skill_questions", messages, temperature=0.5)
             return result
         except Exception as e:
             return {"error": f"Question generation failed: {str(e)}"}
     
-    def parse_and_improve_resume(self, resume_text, assessment, additional_info=""):
+    def parse_and_improve_resume(self, resume_text, assessment, additional_info="", sections=None):
         """Parse resume and create improved structured version"""
-        prompt = f"""
-        Parse and improve the following resume based on assessment feedback:
-
-        Original Resume:
-        {resume_text}
-
-        Assessment Feedback:
-        - Score: {assessment.get('overall_score', 'N/A')}/10
-        - Strengths: {', '.join(assessment.get('strengths', []))}
-        - Areas for improvement: {', '.join(assessment.get('improvements', []))}
-        - Recommended skills: {', '.join(assessment.get('recommended_skills', []))}
-        - Missing sections: {', '.join(assessment.get('missing_sections', []))}
-
-        Additional Information:
-        {additional_info}
-
-        Create an improved, structured resume with the following sections. Return as JSON:
-        {{
-            "personal_info": {{
-                "name": "Full Name",
-                "email": "email@example.com",
-                "phone": "Phone Number",
-                "location": "City, State",
-                "linkedin": "LinkedIn URL (optional)",
-                "portfolio": "Website URL (optional)"
-            }},
-            "professional_summary": "A compelling 2-3 sentence professional summary with strong action words and quantified achievements",
-            "experience": [
-                {{
-                    "title": "Job Title",
-                    "company": "Company Name",
-                    "location": "City, State",
-                    "duration": "MM/YYYY - MM/YYYY",
-                    "achievements": [
-                        "• Achievement 1 with quantified results",
-                        "• Achievement 2 with strong action verbs",
-                        "• Achievement 3 showing impact"
-                    ]
-                }}
-            ],
-            "education": [
-                {{
-                    "degree": "Degree Type and Major",
-                    "institution": "University Name",
-                    "location": "City, State",
-                    "graduation": "MM/YYYY",
-                    "gpa": "GPA (if 3.5+, otherwise omit)",
-                    "honors": "Honors/Awards (optional)"
-                }}
-            ],
-            "skills": {{
-                "technical": ["Technical Skill 1", "Technical Skill 2"],
-                "languages": ["Language 1", "Language 2"],
-                "tools": ["Tool 1", "Tool 2"]
-            }},
-            "projects": [
-                {{
-                    "name": "Project Name",
-                    "description": "Brief description with technologies used and impact",
-                    "link": "GitHub/Demo link (optional)"
-                }}
-            ],
-            "certifications": ["Certification 1", "Certification 2"],
-            "achievements": ["Award 1", "Award 2"]
-        }}
-
-        Ensure all content is improved with:
-        - Strong action verbs (Led, Implemented, Achieved, Optimized, etc.)
-        - Quantified results where possible
-        - Professional language
-        - ATS-friendly formatting
-        - Industry-relevant keywords
-        """
+        fitted_resume = self.token_budget.fit_resume(
+            resume_text, sections, omit=STAGE_OMITTED_SECTIONS['parse_and_improve_resume']
+        )
+        prompt = PromptBuilder(IMPROVE_RESUME_SYSTEM_PROMPT)
+        prompt.add_section("Original Resume", fitted_resume)
+        prompt.add_fields("Assessment Feedback", [
+            ("Score", f"{assessment.get('overall_score', 'N/A')}/10"),
+            ("Strengths", ', '.join(assessment.get('strengths', []))),
+            ("Areas for improvement", ', '.join(assessment.get('improvements', []))),
+            ("Recommended skills", ', '.join(assessment.get('recommended_skills', []))),
+            ("Missing sections", ', '.join(assessment.get('missing_sections', []))),
+        ])
+        prompt.add_section("Additional Information", additional_info)
+        self.token_budget.record("parse_and_improve_resume", resume_text, fitted_resume, prompt)
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=3000
-            )
-            
-            result = json.loads(response.choices[0].message.content)
+            result = self._complete("parse_and_improve_resume", prompt.build(), temperature=0.3)
             return result
         except Exception as e:
             return {"error": f"Assessment failed: {str(e)}"}
     
-    def create_ats_optimized_resume(self, resume_text, assessment, user_responses):
-        """Create ATS-optimized resume combining assessment and user input"""
-        prompt = f"""
-        Create an ATS-optimized, professional resume combining the original resume, assessment feedback, and user responses:
-
-        ORIGINAL RESUME:
-        {resume_text}
-
-        ASSESSMENT RESULTS:
-        - Overall Score: {assessment.get('overall_score', 'N/A')}/10
-        - Experience Level: {assessment.get('experience_level', '')}
-        - Current Skills: {', '.join(assessment.get('current_skills', []))}
-        - Recommended Skills: {', '.join(assessment.get('recommended_skills', []))}
-        - Areas for Improvement: {', '.join(assessment.get('improvements', []))}
-        - Missing Sections: {', '.join(assessment.get('missing_sections', []))}
-
-        USER RESPONSES:
-        - Career Objective: {user_responses.get('career_objective', '')}
-        - Key Achievements: {user_responses.get('achievements', '')}
-        - Additional Skills: {user_responses.get('skills_to_add', '')}
-        - Recent Projects: {user_responses.get('recent_projects', '')}
-        - Target Industry: {user_responses.get('target_industry', '')}
-        - Target Level: {user_responses.get('target_level', '')}
-        - Company Size Preference: {user_responses.get('company_size', '')}
-
-        Create an ATS-optimized resume with these requirements:
-        1. Use industry-specific keywords for {user_responses.get('target_industry', 'Technology')}
-        2. Format for {user_responses.get('target_level', 'Mid Level')} positions
-        3. Include quantified achievements from user responses
-        4. Use strong action verbs and measurable results
-        5. Ensure ATS-friendly formatting with clear section headers
-        6. Incorporate both existing and recommended skills strategically
-        7. Create compelling professional summary targeting the user's objective
-
-        Return as JSON with this exact structure:
-        {{
-            "personal_info": {{
-                "name": "Full Name",
-                "email": "email@example.com",
-                "phone": "Phone Number",
-                "location": "City, State",
-                "linkedin": "LinkedIn URL (if available)",
-                "portfolio": "Website URL (if available)"
-            }},
-            "professional_summary": "2-3 sentence compelling summary with keywords for {user_responses.get('target_industry', 'Technology')} industry and {user_responses.get('target_level', 'Mid Level')} level",
-            "experience": [
-                {{
-                    "title": "Job Title",
-                    "company": "Company Name",
-                    "location": "City, State",
-                    "duration": "MM/YYYY - MM/YYYY",
-                    "achievements": [
-                        "• Enhanced achievement with quantified results and strong action verbs",
-                        "• Another achievement showing impact and using industry keywords",
-                        "• Third achievement demonstrating skills relevant to target role"
-                    ]
-                }}
-            ],
-            "education": [
-                {{
-                    "degree": "Degree Type and Major",
-                    "institution": "University Name",
-                    "location": "City, State",
-                    "graduation": "MM/YYYY",
-                    "gpa": "GPA (if 3.5+)",
-                    "honors": "Relevant honors/awards"
-                }}
-            ],
-            "skills": {{
-                "technical": ["Priority technical skills for target role"],
-                "tools": ["Industry-relevant tools and platforms"],
-                "languages": ["Programming/spoken languages if relevant"],
-                "certifications": ["Relevant certifications"]
-            }},
-            "projects": [
-                {{
-                    "name": "Project Name",
-                    "description": "Description emphasizing technologies and impact with measurable results",
-                    "link": "GitHub/Demo link (if available)"
-                }}
-            ],
-            "achievements": [
-                "Key career achievements with quantified results",
-                "Awards, recognitions, or notable accomplishments"
-            ]
-        }}
-
-        CRITICAL ATS OPTIMIZATION REQUIREMENTS:
-        - Use exact keywords from target industry and role level
-        - Include metrics and numbers wherever possible
-        - Use standard section headers (EXPERIENCE, EDUCATION, SKILLS, etc.)
-        - Avoid graphics, tables, or complex formatting
-        - Front-load important keywords in job descriptions
-        - Include both hard and soft skills relevant to target role
-        - Ensure 70%+ keyword match for {user_responses.get('target_industry', 'Technology')} {user_responses.get('target_level', 'Mid Level')} positions
-        """
+    @instrument_stage('create_ats_optimized_resume')
+    def create_ats_optimized_resume(self, resume_text, assessment, user_responses, stream=False, sections=None):
+        """Create ATS-optimized resume combining assessment and user input (a JSONCompletionStream when stream=True)"""
+        fitted_resume = self.token_budget.fit_resume(
+            resume_text, sections, omit=STAGE_OMITTED_SECTIONS['create_ats_optimized_resume']
+        )
+        prompt = PromptBuilder(ATS_RESUME_SYSTEM_PROMPT)
+        prompt.add_section("ORIGINAL RESUME", fitted_resume)
+        prompt.add_fields("ASSESSMENT RESULTS", [
+            ("Overall Score", f"{assessment.get('overall_score', 'N/A')}/10"),
+            ("Experience Level", assessment.get('experience_level', '')),
+            ("Current Skills", ', '.join(assessment.get('current_skills', []))),
+            ("Recommended Skills", ', '.join(assessment.get('recommended_skills', []))),
+            ("Areas for Improvement", ', '.join(assessment.get('improvements', []))),
+            ("Missing Sections", ', '.join(assessment.get('missing_sections', []))),
+        ])
+        prompt.add_fields("USER RESPONSES", [
+            ("Career Objective", user_responses.get('career_objective', '')),
+            ("Key Achievements", user_responses.get('achievements', '')),
+            ("Additional Skills", user_responses.get('skills_to_add', '')),
+            ("Recent Projects", user_responses.get('recent_projects', '')),
+            ("Target Industry", user_responses.get('target_industry', '') or 'Technology'),
+            ("Target Level", user_responses.get('target_level', '') or 'Mid Level'),
+            ("Company Size Preference", user_responses.get('company_size', '')),
+        ])
+        self.token_budget.record("create_ats_optimized_resume", resume_text, fitted_resume, prompt)
+        messages = prompt.build()
         
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,  # Lower temperature for more consistent, professional output
-                max_tokens=3500
+        if stream:
+            return JSONCompletionStream(
+                self._stream("create_ats_optimized_resume", messages, temperature=0.2, parse_json=True),
+                "ATS resume creation failed"
             )
-            
-            result = json.loads(response.choices[0].message.content)
+
+        try:
+            result = self._complete("create_ats_optimized_resume", messages, temperature=0.2)  # Lower temperature for more consistent, professional output
             return result
         except Exception as e:
             return {"error": f"ATS resume creation failed: {str(e)}"}
     
-    def generate_cover_letter(self, resume_data, user_responses, job_description="", company_name=""):
-        """Generate a personalized cover letter"""
-        prompt = f"""
-        Create a professional, compelling cover letter based on the following information:
-
-        RESUME DATA:
-        - Name: {resume_data.get('personal_info', {}).get('name', 'Candidate')}
-        - Professional Summary: {resume_data.get('professional_summary', '')}
-        - Experience: {[exp.get('title', '') + ' at ' + exp.get('company', '') for exp in resume_data.get('experience', [])]}
-        - Skills: {', '.join([skill for category in resume_data.get('skills', {}).values() for skill in (category if isinstance(category, list) else [])])}
-
-        USER GOALS:
-        - Career Objective: {user_responses.get('career_objective', '')}
-        - Target Industry: {user_responses.get('target_industry', 'Technology')}
-        - Target Level: {user_responses.get('target_level', 'Mid Level')}
-        - Key Achievements: {user_responses.get('achievements', '')}
-        - Company Size Preference: {user_responses.get('company_size', '')}
-
-        JOB DETAILS:
-        - Company Name: {company_name if company_name else 'the company'}
-        - Job Description: {job_description if job_description else 'the position'}
-
-        Create a cover letter that:
-        1. Has a strong opening that grabs attention
-        2. Demonstrates knowledge of the company/role (if provided)
-        3. Highlights relevant experience and achievements with specific examples
-        4. Shows enthusiasm for the target industry and role
-        5. Includes a compelling call to action
-        6. Is 3-4 paragraphs long
-        7. Uses industry-appropriate language and keywords
-        8. Shows personality while maintaining professionalism
-
-        Format as a complete cover letter with proper structure:
-        - Date
-        - Recipient (Dear Hiring Manager or specific name if provided)
-        - Body paragraphs
-        - Professional closing
-        - Signature line
-
-        Make it compelling and personalized, not generic.
-        """
+    @instrument_stage('generate_cover_letter', is_error=lambda text: text.startswith("Cover letter generation failed:"))
+    def generate_cover_letter(self, resume_data, user_responses, job_description="", company_name="", stream=False):
+        """Generate a personalized cover letter (a CompletionStream of text chunks when stream=True)"""
+        prompt = PromptBuilder(COVER_LETTER_SYSTEM_PROMPT)
+        prompt.add_fields("RESUME DATA", [
+            ("Name", resume_data.get('personal_info', {}).get('name', 'Candidate')),
+            ("Professional Summary", resume_data.get('professional_summary', '')),
+            ("Experience", [exp.get('title', '') + ' at ' + exp.get('company', '') for exp in resume_data.get('experience', [])]),
+            ("Skills", ', '.join([skill for category in resume_data.get('skills', {}).values() for skill in (category if isinstance(category, list) else [])])),
+        ])
+        prompt.add_fields("USER GOALS", [
+            ("Career Objective", user_responses.get('career_objective', '')),
+            ("Target Industry", user_responses.get('target_industry', 'Technology')),
+            ("Target Level", user_responses.get('target_level', 'Mid Level')),
+            ("Key Achievements", user_responses.get('achievements', '')),
+            ("Company Size Preference", user_responses.get('company_size', '')),
+        ])
+        prompt.add_fields("JOB DETAILS", [
+            ("Company Name", company_name if company_name else 'the company'),
+            ("Job Description", job_description if job_description else 'the position'),
+        ])
+        messages = prompt.build()
         
+        if stream:
+            return self._stream("generate_cover_letter", messages, temperature=0.4)
+
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.4,  # Slightly higher for more personality
-                max_tokens=1500
-            )
-            
-            return response.choices[0].message.content
+            return self._complete("generate_cover_letter", messages, temperature=0.4, parse_json=False)  # Slightly higher for more personality
         except Exception as e:
             return f"Cover letter generation failed: {str(e)}"
     
+    @instrument_stage('regenerate_resume_section')
+    def regenerate_resume_section(self, resume, path, assessment, user_responses):
+        """Rewrite a single resume section with a small prompt; returns the new section value"""
+        section_name = SECTION_PATH_PATTERN.match(path).group(1)
+        relevant_fields = [field for field, targets in RESUME_SECTION_INPUTS.items() if section_name in targets]
+        prompt = PromptBuilder(SECTION_REWRITE_SYSTEM_PROMPT)
+        prompt.add_section("SECTION", path)
+        prompt.add_section("CURRENT SECTION", json.dumps(get_resume_section(resume, path), indent=2))
+        prompt.add_fields("CANDIDATE", [
+            ("Target Industry", user_responses.get('target_industry', '') or 'Technology'),
+            ("Target Level", user_responses.get('target_level', '') or 'Mid Level'),
+            ("Experience Level", assessment.get('experience_level', '')),
+            ("Current Skills", ', '.join(assessment.get('current_skills', []))),
+        ])
+        prompt.add_fields("ANSWERS", [
+            (field.replace('_', ' ').title(), user_responses.get(field, '')) for field in relevant_fields
+        ])
+        
+        try:
+            result = self._complete("regenerate_resume_section", prompt.build(), temperature=0.2)
+            if "section" not in result:
+                return {"error": "Section regeneration failed: response has no 'section'"}
+            current = get_resume_section(resume, path)
+            if current is not None and type(result["section"]) is not type(current):
+                return {"error": f"Section regeneration failed: expected {type(current).__name__} for {path}"}
+            return result
+        except Exception as e:
+            return {"error": f"Section regeneration failed: {str(e)}"}
+
+    def update_resume_sections(self, resume, assessment, old_responses, new_responses, on_event=None):
+        """Regenerate only the sections affected by changed answers and merge them into the resume.
+
+        Returns (updated_resume, regenerated_paths, errors); sections that fail keep their
+        previous content. on_event is forwarded to the StageGraph that runs them in parallel.
+        """
+        paths = affected_resume_sections(old_responses, new_responses, resume)
+        graph = StageGraph(max_workers=4)
+        for path in paths:
+            graph.add(
+                path,
+                lambda inputs, progress, path=path: self.regenerate_resume_section(
+                    resume, path, assessment, new_responses
+                )
+            )
+        results, errors = graph.run(on_event=on_event)
+
+        updated = resume
+        regenerated = []
+        for path in paths:
+            result = results.get(path)
+            if result is None or "error" in result:
+                errors[path] = (result or {}).get("error") or errors.get(path)
+                continue
+            updated = set_resume_section(updated, path, result["section"])
+            regenerated.append(path)
+        return updated, regenerated, errors
+
+    @instrument_stage('generate_portfolio_website', is_error=lambda html: html.startswith("Portfolio generation failed:"))
     def generate_portfolio_website(self, resume_data, user_responses):
         """Generate a complete HTML/CSS/JS portfolio website"""
         try:
@@ -1185,6 +3110,7 @@ class ResumeAssessmentSystem:
             return f"Portfolio generation failed: {str(e)}"
 
 
+@instrument_stage('create_resume_pdf')
 def create_resume_pdf(resume_data, assessment_data=None):
     """Create a professional PDF resume"""
     buffer = io.BytesIO()
@@ -1192,55 +3118,12 @@ def create_resume_pdf(resume_data, assessment_data=None):
                           rightMargin=72, leftMargin=72,
                           topMargin=72, bottomMargin=18)
     
-    # Get styles
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=6,
-        alignment=TA_CENTER,
-        textColor=colors.HexColor('#2C3E50')
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=6,
-        spaceBefore=12,
-        textColor=colors.HexColor('#2C3E50'),
-        borderWidth=1,
-        borderColor=colors.HexColor('#3498DB'),
-        borderPadding=3
-    )
-    
-    contact_style = ParagraphStyle(
-        'ContactStyle',
-        parent=styles['Normal'],
-        fontSize=11,
-        alignment=TA_CENTER,
-        spaceAfter=12
-    )
-    
-    body_style = ParagraphStyle(
-        'BodyStyle',
-        parent=styles['Normal'],
-        fontSize=11,
-        spaceAfter=6,
-        alignment=TA_JUSTIFY
-    )
-    
-    bullet_style = ParagraphStyle(
-        'BulletStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=3,
-        leftIndent=20,
-        bulletIndent=10
-    )
+    styles = get_pdf_styles('resume', letter)
+    title_style = styles['CustomTitle']
+    heading_style = styles['CustomHeading']
+    contact_style = styles['ContactStyle']
+    body_style = styles['BodyStyle']
+    bullet_style = styles['BulletStyle']
     
     story = []
     
@@ -1325,7 +3208,7 @@ def create_resume_pdf(resume_data, assessment_data=None):
         
         if isinstance(skills, dict):
             for category, skill_list in skills.items():
-                if skill_list:
+                if skill_list and category != 'certifications':
                     category_title = category.replace('_', ' ').title()
                     skills_text = f"<b>{category_title}:</b> {', '.join(skill_list)}"
                     story.append(Paragraph(skills_text, body_style))
@@ -1352,10 +3235,14 @@ def create_resume_pdf(resume_data, assessment_data=None):
             
             story.append(Spacer(1, 6))
     
-    # Certifications
-    if resume_data.get('certifications'):
+    # Certifications (older cached resumes list them under skills)
+    certifications = list(resume_data.get('certifications') or [])
+    skills = resume_data.get('skills')
+    if isinstance(skills, dict):
+        certifications += [c for c in skills.get('certifications') or [] if c not in certifications]
+    if certifications:
         story.append(Paragraph("CERTIFICATIONS", heading_style))
-        for cert in resume_data['certifications']:
+        for cert in certifications:
             story.append(Paragraph(f"• {cert}", bullet_style))
         story.append(Spacer(1, 6))
     
@@ -1370,24 +3257,17 @@ def create_resume_pdf(resume_data, assessment_data=None):
     buffer.seek(0)
     return buffer
 
+@instrument_stage('create_assessment_report_pdf')
 def create_assessment_report_pdf(assessment_data, questions_data=None):
     """Create PDF assessment report"""
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
     
-    styles = getSampleStyleSheet()
+    styles = get_pdf_styles('assessment_report', letter)
     story = []
     
     # Title
-    title_style = ParagraphStyle(
-        'ReportTitle',
-        parent=styles['Title'],
-        fontSize=20,
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    story.append(Paragraph("Resume Assessment Report", title_style))
+    story.append(Paragraph("Resume Assessment Report", styles['ReportTitle']))
     story.append(Spacer(1, 20))
     
     # Assessment Results
@@ -1436,14 +3316,428 @@ def create_assessment_report_pdf(assessment_data, questions_data=None):
     buffer.seek(0)
     return buffer
 
+# Bump whenever create_resume_pdf or create_assessment_report_pdf change what they draw
+PDF_TEMPLATE_VERSION = 1
+
+class RenderCache:
+    """Rendered PDF bytes keyed by renderer, PDF_TEMPLATE_VERSION and a hash of the input dicts.
+
+    Step 4 rebuilds its download buttons on every rerun (each keystroke or click); with
+    unchanged inputs the bytes come from this LRU, bounded by total size, instead of another
+    ReportLab layout. Only content that can be rendered again belongs here: an evicted entry
+    just costs a re-render.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_entries=64):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(renderer, *args):
+        return LLMResponseCache.make_key(
+            renderer=renderer.__name__, template_version=PDF_TEMPLATE_VERSION, args=args
+        )
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        """Store data under key; files larger than the whole cache are not kept"""
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = data
+                self._size += len(data)
+            self._entries.move_to_end(key)
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def render(self, renderer, *args):
+        """renderer(*args).getvalue(), rendered at most once per distinct input while cached"""
+        key = self.make_key(renderer, *args)
+        data = self.get(key)
+        if data is None:
+            data = renderer(*args).getvalue()
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+@st.cache_resource
+def get_render_cache():
+    """Process-wide cache of rendered PDFs; the inputs are hashed, so sessions can share it"""
+    return RenderCache(
+        max_bytes=int(float(os.getenv('RENDER_CACHE_MAX_MB', '32')) * 1024 * 1024),
+        max_entries=int(os.getenv('RENDER_CACHE_ENTRIES', '64'))
+    )
+
+def render_assessment_metrics(assessment):
+    """Render the assessment metric cards; fields not yet available (while streaming) show a placeholder"""
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-value">{assessment.get('overall_score', '…')}/10</div>
+            <div class="metric-label">Overall Score</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-value">{len(assessment.get('strengths', []))}</div>
+            <div class="metric-label">Key Strengths</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-value">{len(assessment.get('current_skills', []))}</div>
+            <div class="metric-label">Skills Found</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-value">{assessment.get('experience_level') or '…'}</div>
+            <div class="metric-label">Experience Level</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+def render_extraction_warnings():
+    """Say when only part of the uploaded PDF was read"""
+    for message in st.session_state.extraction_warnings:
+        st.warning(f"⚠️ {message} Results are based on the part that was read.")
+
+def deferred_download_button(name, prepare_label, label, renderer, args, file_name, mime):
+    """Download button whose file is rendered only once the user asks for it.
+
+    Streamlit 1.28 needs download data when the button is drawn, so a first click prepares
+    the file. The session remembers the render key (a hash of the renderer and its inputs)
+    that was prepared; later reruns serve those bytes from the render cache. Edited inputs
+    hash to a new key, which clears the prepared state and goes back to the prepare button.
+    """
+    cache = get_render_cache()
+    key = cache.make_key(renderer, *args)
+    if st.session_state.artifacts.get(name, key) != key:
+        del st.session_state.artifacts[name]
+    requested = name in st.session_state.artifacts
+    if not requested and st.button(prepare_label, key=f"prepare_{name}", use_container_width=True):
+        st.session_state.artifacts[name] = key
+        requested = True
+    if requested:
+        st.download_button(
+            label=label,
+            data=cache.render(renderer, *args),
+            file_name=file_name,
+            mime=mime,
+            use_container_width=True
+        )
+
+def write_text_stream(stream):
+    """Render a CompletionStream incrementally and return the text shown"""
+    if hasattr(st, 'write_stream'):
+        st.write_stream(stream)
+    else:
+        # st.write_stream is only available on newer Streamlit releases
+        placeholder = st.empty()
+        for _ in stream:
+            placeholder.markdown(stream.text + "▌")
+        placeholder.markdown(stream.text)
+    return stream.text
+
+def merge_interview_questions(*question_sets):
+    """Combine question sets, skipping failed ones and repeated questions"""
+    merged, seen = [], set()
+    for question_set in question_sets:
+        if not question_set or "error" in question_set:
+            continue
+        for question in question_set.get('questions', []):
+            text = question.get('question', '').strip().lower()
+            if text and text not in seen:
+                seen.add(text)
+                merged.append(question)
+    return {"questions": merged}
+
+def new_skills_to_cover(assessment, skills_to_add):
+    """Skills the user added that the assessment's question set does not already cover"""
+    known = {skill.strip().lower() for skill in assessment.get('current_skills', [])}
+    added = [skill.strip() for skill in skills_to_add.split(',') if skill.strip()]
+    return [skill for skill in added if skill.lower() not in known]
+
+TARGET_INDUSTRIES = ["Technology", "Healthcare", "Finance", "Education", "Consulting",
+                     "Marketing", "Sales", "Manufacturing", "Non-profit", "Government", "Other"]
+COMPANY_SIZES = ["Startup (1-50)", "Small (51-200)", "Medium (201-1000)",
+                 "Large (1000+)", "Enterprise (5000+)", "No preference"]
+TARGET_LEVELS = ["Entry Level", "Mid Level", "Senior Level", "Lead/Principal", "Management", "Executive"]
+
+class StageGraph:
+    """Runs pipeline stages on a thread pool as soon as the stages they depend on have finished"""
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.stages = {}
+
+    def add(self, name, fn, depends_on=()):
+        """Register a stage; fn(inputs, progress) receives a dict of its dependencies' results"""
+        for dep in depends_on:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = (fn, tuple(depends_on))
+        return self
+
+    def run(self, on_event=None, poll_interval=0.1):
+        """Execute the graph and return (results, errors).
+
+        on_event(stage, status, payload) is always invoked on the calling thread, so it may
+        safely update Streamlit elements. Statuses: running, progress, done, failed, skipped.
+        """
+        events = queue.Queue()
+        results, errors, started = {}, {}, {}
+        pending = dict(self.stages)
+        futures = {}
+
+        def emit(name, status, payload=None):
+            if on_event is not None:
+                on_event(name, status, payload)
+
+        def drain_events():
+            drained = []
+            while True:
+                try:
+                    drained.append(events.get_nowait())
+                except queue.Empty:
+                    break
+            # Only the latest progress payload per stage is worth rendering
+            latest_progress = {name: i for i, (name, status, _) in enumerate(drained) if status == "progress"}
+            for i, event in enumerate(drained):
+                if event[1] != "progress" or latest_progress[event[0]] == i:
+                    emit(*event)
+
+        def progress_reporter(name):
+            return lambda payload: events.put((name, "progress", payload))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as pool:
+            while pending or futures:
+                # Skip stages whose dependencies failed, then submit everything that is ready
+                for name, (fn, deps) in list(pending.items()):
+                    failed_deps = [dep for dep in deps if dep in errors]
+                    if failed_deps:
+                        del pending[name]
+                        errors[name] = RuntimeError(f"Skipped because {', '.join(failed_deps)} failed")
+                        emit(name, "skipped", errors[name])
+                    elif all(dep in results for dep in deps):
+                        del pending[name]
+                        inputs = {dep: results[dep] for dep in deps}
+                        started[name] = time.perf_counter()
+                        futures[pool.submit(fn, inputs, progress_reporter(name))] = name
+                        emit(name, "running")
+
+                if not futures:
+                    break
+
+                done, _ = wait(list(futures), timeout=poll_interval, return_when=FIRST_COMPLETED)
+                drain_events()
+                for future in done:
+                    name = futures.pop(future)
+                    elapsed = time.perf_counter() - started[name]
+                    try:
+                        results[name] = future.result()
+                        emit(name, "done", elapsed)
+                    except Exception as e:
+                        errors[name] = e
+                        emit(name, "failed", e)
+
+            drain_events()
+
+        return results, errors
+
+METRICS.describe('speculative_jobs_total', 'Background jobs started ahead of form submit, by outcome')
+
+class SpeculativeStore:
+    """Per-session background work started before the user has confirmed its inputs.
+
+    Jobs are keyed by name plus a fingerprint of their inputs, so a result is only reused for
+    the inputs it was computed from. New jobs are refused once the session's estimated token
+    budget is spent; jobs not claimed within ttl_seconds are cancelled (if still queued) and
+    dropped. Results are plain futures, so workers never touch st.session_state.
+    """
+
+    def __init__(self, executor, token_budget=8000, ttl_seconds=900):
+        self.executor = executor
+        self.token_budget = token_budget
+        self.ttl_seconds = ttl_seconds
+        self.tokens_spent = 0
+        self._jobs = {}
+
+    def start(self, name, fingerprint, fn, estimated_tokens):
+        """Submit fn() unless the same job already exists; returns False when over budget"""
+        self.expire()
+        key = (name, fingerprint)
+        if key in self._jobs:
+            return True
+        if self.tokens_spent + estimated_tokens > self.token_budget:
+            METRICS.inc('speculative_jobs_total', job=name, outcome='refused')
+            return False
+        self.tokens_spent += estimated_tokens
+        self._jobs[key] = (self.executor.submit(fn), time.time())
+        METRICS.inc('speculative_jobs_total', job=name, outcome='started')
+        return True
+
+    def claim(self, name, fingerprint):
+        """Take ownership of a job's future (finished or still running), or None if there is none"""
+        self.expire()
+        job = self._jobs.pop((name, fingerprint), None)
+        if job is None:
+            return None
+        METRICS.inc('speculative_jobs_total', job=name, outcome='claimed')
+        return job[0]
+
+    def expire(self):
+        now = time.time()
+        for key, (future, started) in list(self._jobs.items()):
+            if now - started > self.ttl_seconds:
+                self._drop(key, 'expired')
+
+    def discard(self):
+        """Cancel everything that was not claimed"""
+        for key in list(self._jobs):
+            self._drop(key, 'discarded')
+
+    def _drop(self, key, outcome):
+        future, _ = self._jobs.pop(key)
+        # Requests already in flight run to completion; their responses still land in the LLM cache
+        future.cancel()
+        METRICS.inc('speculative_jobs_total', job=key[0], outcome=outcome)
+
+def start_speculative_work(store, assessment_system, resume_text, assessment, sections=None):
+    """Kick off the work that only depends on the assessment while the user fills in the form"""
+    fingerprint = LLMResponseCache.make_key(resume_text=resume_text, assessment=assessment)
+    resume_tokens = min(count_tokens(resume_text), assessment_system.token_budget.resume_budget)
+
+    def estimate(stage):
+        return resume_tokens + (assessment_system.router.route(stage)["max_tokens"] or 1000)
+
+    # A combined assessment already carries interview questions for the detected skills
+    if not (assessment.get('interview_questions') or {}).get('questions'):
+        store.start(
+            "interview_questions", fingerprint,
+            lambda: assessment_system.generate_skill_questions(
+                assessment['current_skills'], assessment['experience_level']
+            ),
+            estimate('generate_skill_questions')
+        )
+    # The improved draft becomes the base of Step 3: only the sections the answers feed are rewritten
+    store.start(
+        "draft_resume", fingerprint,
+        lambda: assessment_system.parse_and_improve_resume(resume_text, assessment, sections=sections),
+        estimate('parse_and_improve_resume')
+    )
+    return fingerprint
+
+@st.cache_resource
+def get_speculation_executor():
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv('SPECULATION_MAX_WORKERS', '4')),
+        thread_name_prefix="speculate"
+    )
+
+def get_speculative_store():
+    if 'speculation' not in st.session_state:
+        st.session_state.speculation = SpeculativeStore(
+            get_speculation_executor(),
+            token_budget=int(os.getenv('SPECULATION_TOKEN_BUDGET', '8000')),
+            ttl_seconds=int(os.getenv('SPECULATION_TTL_SECONDS', '900'))
+        )
+    return st.session_state.speculation
+
 @st.cache_resource
 def get_assessment_system():
+    start_metrics_exporters(METRICS)
     return ResumeAssessmentSystem()
 
+def render_admin_panel(assessment_system, registry):
+    """Operational metrics for operators; enabled with SHOW_ADMIN_PANEL=1"""
+    with st.sidebar.expander("🛠️ Admin: performance metrics", expanded=False):
+        st.markdown("**Stage wall time (s)**")
+        st.dataframe(registry.histogram_summary('resume_stage_duration_seconds'), use_container_width=True)
+        st.markdown("**PDF page extraction (s)**")
+        st.dataframe(registry.histogram_summary('pdf_page_extract_seconds'), use_container_width=True)
+        st.markdown("**LLM requests (s)**")
+        st.dataframe(registry.histogram_summary('llm_request_duration_seconds'), use_container_width=True)
+        st.markdown("**Tokens**")
+        st.dataframe(registry.counter_values('llm_tokens_total'), use_container_width=True)
+        st.markdown("**Errors and retries**")
+        st.dataframe(
+            registry.counter_values('resume_stage_errors_total')
+            + registry.counter_values('llm_errors_total')
+            + registry.counter_values('llm_retries_total'),
+            use_container_width=True
+        )
+        st.markdown("**Model routes**")
+        st.json(assessment_system.router.stats(), expanded=False)
+        st.markdown("**Circuit breakers / hedging**")
+        st.json({
+            "circuit_breakers": assessment_system.router.breaker_stats(),
+            "hedging": assessment_system.hedger.stats(),
+        }, expanded=False)
+        st.markdown("**Rate limiter / coalescing / caches**")
+        st.json({
+            "rate_limiter": assessment_system.rate_limiter.stats(),
+            "single_flight": assessment_system.single_flight.stats(),
+            "response_cache": assessment_system.cache.stats() if assessment_system.cache is not None else None,
+            "extraction_cache": assessment_system.extraction_cache.stats(),
+            "render_cache": get_render_cache().stats(),
+            "prompt_cache": assessment_system.prompt_cache_stats,
+        }, expanded=False)
+        st.caption(
+            f"Prompt-prefix caching only applies to prefixes of {PROMPT_CACHE_MIN_TOKENS}+ tokens; "
+            "the static system prompts are shorter, so cached_tokens of 0 is expected."
+        )
+        st.download_button(
+            "📥 Prometheus metrics",
+            data=registry.render_prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
+
 def main():
     # Initialize session state
     if 'resume_text' not in st.session_state:
         st.session_state.resume_text = ""
+    if 'resume_sections' not in st.session_state:
+        st.session_state.resume_sections = None
+    if 'extraction_warnings' not in st.session_state:
+        st.session_state.extraction_warnings = []
+    if 'artifacts' not in st.session_state:
+        st.session_state.artifacts = {}
     if 'assessment' not in st.session_state:
         st.session_state.assessment = None
     if 'questions_answered' not in st.session_state:
@@ -1454,9 +3748,14 @@ def main():
         st.session_state.improved_resume = None
     if 'interview_questions' not in st.session_state:
         st.session_state.interview_questions = None
+    if 'interview_questions_stale' not in st.session_state:
+        st.session_state.interview_questions_stale = False
 
     assessment_system = get_assessment_system()
     
+    if os.getenv('SHOW_ADMIN_PANEL') == '1':
+        render_admin_panel(assessment_system, METRICS)
+    
     # Hero Section
     if not st.session_state.resume_text:
         st.markdown("""
@@ -1610,8 +3909,25 @@ def main():
         
         if uploaded_file is not None:
             with st.spinner("📄 Extracting text from your PDF resume..."):
-                resume_text = assessment_system.extract_text_from_pdf(uploaded_file)
-                st.session_state.resume_text = resume_text
+                extraction_progress = st.empty()
+
+                def show_extraction_progress(pages_read, pages_to_read):
+                    extraction_progress.progress(
+                        pages_read / pages_to_read, text=f"Read page {pages_read} of {pages_to_read}"
+                    )
+
+                try:
+                    extraction = assessment_system.extract_pdf(uploaded_file, on_page=show_extraction_progress)
+                except Exception as e:
+                    st.error(f"❌ We couldn't read this PDF: {str(e)}")
+                    st.stop()
+                extraction_progress.empty()
+                if not extraction["text"].strip():
+                    st.error("❌ No text found in this PDF. Scanned resumes need to be converted to text first.")
+                    st.stop()
+                st.session_state.resume_text = extraction["text"]
+                st.session_state.resume_sections = extraction["sections"]
+                st.session_state.extraction_warnings = [warning["message"] for warning in extraction["warnings"]]
                 
             st.markdown("""
             <div class="success-container">
@@ -1619,11 +3935,40 @@ def main():
                 <p>Your resume has been processed and is ready for analysis.</p>
             </div>
             """, unsafe_allow_html=True)
+            render_extraction_warnings()
+            normalization = extraction.get("normalization")
+            if normalization and normalization["tokens_removed"] > 0:
+                st.caption(
+                    f"Cleaned up {normalization['chars_removed']:,} characters (~{normalization['tokens_removed']:,} tokens) "
+                    f"of repeated headers, footers and layout noise before analysis."
+                )
             
-            # Automatically start assessment
-            with st.spinner("🤖 AI is analyzing your resume..."):
-                assessment = assessment_system.assess_resume(st.session_state.resume_text)
-                st.session_state.assessment = assessment
+            # Show the local analyzer's result instantly, then let the AI's fields replace it as they arrive
+            st.markdown("#### 🤖 AI is analyzing your resume...")
+            live_metrics = st.empty()
+            live_strengths = st.empty()
+            preliminary = analyze_resume_locally(st.session_state.resume_text, st.session_state.resume_sections)
+            with live_metrics.container():
+                render_assessment_metrics(preliminary)
+            with live_strengths.container():
+                st.caption("Preliminary results from a quick scan — refining with AI...")
+                for strength in preliminary['strengths'][:5]:
+                    st.write(f"• {strength}")
+            assessment_stream = assessment_system.assess_resume(
+                st.session_state.resume_text,
+                stream=True,
+                include_questions=os.getenv('COMBINED_ASSESSMENT', '1') == '1',
+                sections=st.session_state.resume_sections
+            )
+            for partial_assessment in assessment_stream:
+                with live_metrics.container():
+                    render_assessment_metrics({**preliminary, **partial_assessment})
+                with live_strengths.container():
+                    for strength in partial_assessment.get('strengths', [])[:5]:
+                        st.write(f"• {strength}")
+            st.session_state.assessment = with_local_fallback(
+                assessment_stream.result, st.session_state.resume_text, st.session_state.resume_sections
+            )
                 
             st.rerun()
     
@@ -1639,41 +3984,15 @@ def main():
         """, unsafe_allow_html=True)
         
         assessment = st.session_state.assessment
+        render_extraction_warnings()
+        if assessment.get('source') == 'local':
+            st.warning(
+                "⚠️ The AI assessment is unavailable right now, so these results come from our "
+                "built-in resume scanner. You can still continue."
+            )
         
         # Metrics in a nice layout
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.markdown(f"""
-            <div class="metric-card">
-                <div class="metric-value">{assessment['overall_score']}/10</div>
-                <div class="metric-label">Overall Score</div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown(f"""
-            <div class="metric-card">
-                <div class="metric-value">{len(assessment.get('strengths', []))}</div>
-                <div class="metric-label">Key Strengths</div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown(f"""
-            <div class="metric-card">
-                <div class="metric-value">{len(assessment.get('current_skills', []))}</div>
-                <div class="metric-label">Skills Found</div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col4:
-            st.markdown(f"""
-            <div class="metric-card">
-                <div class="metric-value">{assessment.get('experience_level', 'Unknown')}</div>
-                <div class="metric-label">Experience Level</div>
-            </div>
-            """, unsafe_allow_html=True)
+        render_assessment_metrics(assessment)
         
         # Assessment details
         col1, col2 = st.columns(2)
@@ -1696,6 +4015,13 @@ def main():
                 st.write(f"• {skill}")
             st.markdown("</div>", unsafe_allow_html=True)
         
+        # Start assessment-only work now so it overlaps with the time spent typing answers
+        speculation = get_speculative_store()
+        speculation_key = start_speculative_work(
+            speculation, assessment_system, st.session_state.resume_text, assessment,
+            sections=st.session_state.resume_sections
+        )
+
         # Step 3: User Questions
         show_progress(2)
         
@@ -1722,17 +4048,9 @@ def main():
                     height=100
                 )
                 
-                target_industry = st.selectbox(
-                    "🏢 Target Industry",
-                    ["Technology", "Healthcare", "Finance", "Education", "Consulting", 
-                     "Marketing", "Sales", "Manufacturing", "Non-profit", "Government", "Other"]
-                )
+                target_industry = st.selectbox("🏢 Target Industry", TARGET_INDUSTRIES)
                 
-                company_size = st.selectbox(
-                    "🏭 Company Size Preference",
-                    ["Startup (1-50)", "Small (51-200)", "Medium (201-1000)", 
-                     "Large (1000+)", "Enterprise (5000+)", "No preference"]
-                )
+                company_size = st.selectbox("🏭 Company Size Preference", COMPANY_SIZES)
             
             with col2:
                 achievements = st.text_area(
@@ -1747,10 +4065,7 @@ def main():
                     height=100
                 )
                 
-                target_level = st.selectbox(
-                    "📈 Target Position Level",
-                    ["Entry Level", "Mid Level", "Senior Level", "Lead/Principal", "Management", "Executive"]
-                )
+                target_level = st.selectbox("📈 Target Position Level", TARGET_LEVELS)
             
             submit_questions = st.form_submit_button("✨ Create My Optimized Resume", type="primary", use_container_width=True)
             
@@ -1767,34 +4082,131 @@ def main():
                     }
                     st.session_state.questions_answered = True
                     
-                    # Automatically generate improved resume
-                    with st.spinner("🚀 Creating your ATS-optimized resume..."):
-                        improved_resume = assessment_system.create_ats_optimized_resume(
-                            st.session_state.resume_text,
-                            st.session_state.assessment,
-                            st.session_state.user_responses
-                        )
-                        st.session_state.improved_resume = improved_resume
-                        
-                    # Generate interview questions
-                    with st.spinner("🎯 Generating personalized interview questions..."):
-                        interview_questions = assessment_system.generate_skill_questions(
-                            st.session_state.assessment['current_skills'] + 
-                            st.session_state.user_responses['skills_to_add'].split(','),
-                            st.session_state.assessment['experience_level']
+                    # Interview questions only need the assessment, so they run alongside the resume.
+                    # The cover letter is streamed on the results page once the resume exists.
+                    # Worker threads must not touch st.session_state, so capture inputs up front.
+                    resume_text = st.session_state.resume_text
+                    resume_sections = st.session_state.resume_sections
+                    assessment = st.session_state.assessment
+                    user_responses = st.session_state.user_responses
+                    
+                    pipeline = StageGraph(max_workers=2)
+                    draft_resume = speculation.claim("draft_resume", speculation_key)
+                    draft_wait_seconds = float(os.getenv('SPECULATION_WAIT_SECONDS', '30'))
+                    section_failures = {}
+                    
+                    def build_improved_resume(inputs, progress):
+                        base_resume = None
+                        if draft_resume is not None:
+                            try:
+                                # Started in Step 2 and usually done; waiting beats rewriting it all
+                                base_resume = draft_resume.result(timeout=draft_wait_seconds)
+                            except Exception:
+                                draft_resume.cancel()
+                                base_resume = None
+                        if base_resume is not None and "error" not in base_resume:
+                            progress(base_resume)
+                            # Only the sections the answers feed are tailored; the rest carry over
+                            tailored_resume, _, failures = assessment_system.update_resume_sections(
+                                base_resume, assessment, {}, user_responses
+                            )
+                            section_failures.update(failures)
+                            return tailored_resume
+                        resume_stream = assessment_system.create_ats_optimized_resume(
+                            resume_text, assessment, user_responses, stream=True, sections=resume_sections
                         )
-                        st.session_state.interview_questions = interview_questions
-                        
-                    st.success("✅ Your optimized resume is ready!")
+                        for partial_resume in resume_stream:
+                            progress(partial_resume)
+                        return resume_stream.result
                     
-                    # Generate cover letter automatically
-                    with st.spinner("📝 Creating your personalized cover letter..."):
-                        cover_letter = assessment_system.generate_cover_letter(
-                            st.session_state.improved_resume,
-                            st.session_state.user_responses
+                    pipeline.add("improved_resume", build_improved_resume)
+                    # A combined assessment (or the speculative job started in Step 2) already
+                    # covers the skills it found; only the skills the user added still need a
+                    # (smaller) follow-up call
+                    embedded_questions = assessment.get('interview_questions')
+                    if not (embedded_questions and embedded_questions.get('questions')):
+                        embedded_questions = None
+                    speculative_questions = None
+                    if embedded_questions is None:
+                        speculative_questions = speculation.claim("interview_questions", speculation_key)
+                    speculation.discard()
+                    added_skills = new_skills_to_cover(assessment, user_responses['skills_to_add'])
+
+                    def build_interview_questions(inputs, progress):
+                        base_questions = embedded_questions
+                        if base_questions is None and speculative_questions is not None:
+                            try:
+                                # Still in flight is fine: waiting beats asking again
+                                base_questions = speculative_questions.result()
+                            except Exception:
+                                base_questions = None
+                            if base_questions is not None and "error" in base_questions:
+                                base_questions = None
+                        if base_questions is None:
+                            return assessment_system.generate_skill_questions(
+                                assessment['current_skills'] + user_responses['skills_to_add'].split(','),
+                                assessment['experience_level']
+                            )
+                        if not added_skills:
+                            return base_questions
+                        return merge_interview_questions(
+                            base_questions,
+                            assessment_system.generate_skill_questions(
+                                added_skills,
+                                assessment['experience_level'],
+                                count=min(5, 2 * len(added_skills))
+                            )
                         )
-                        st.session_state.cover_letter = cover_letter
-                        
+
+                    if embedded_questions is None or added_skills:
+                        pipeline.add("interview_questions", build_interview_questions)
+                    
+                    stage_labels = {
+                        "improved_resume": "🚀 Creating your ATS-optimized resume",
+                        "interview_questions": "🎯 Generating personalized interview questions",
+                    }
+                    stage_labels = {name: label for name, label in stage_labels.items() if name in pipeline.stages}
+                    stage_placeholders = {name: st.empty() for name in stage_labels}
+                    for name, label in stage_labels.items():
+                        stage_placeholders[name].info(f"⏳ {label} (waiting)")
+                    resume_preview = st.empty()
+
+                    def show_stage_event(name, status, payload):
+                        label = stage_labels[name]
+                        if status == "progress" and name == "improved_resume":
+                            with resume_preview.container():
+                                st.markdown("##### 👀 Your optimized resume so far")
+                                st.json(payload)
+                        elif status == "running":
+                            stage_placeholders[name].info(f"⚙️ {label}...")
+                        elif status == "done" and name == "improved_resume" and section_failures:
+                            stage_placeholders[name].warning(
+                                f"⚠️ {label} ({payload:.1f}s): not tailored: {', '.join(section_failures)}"
+                            )
+                        elif status == "done":
+                            stage_placeholders[name].success(f"✅ {label} ({payload:.1f}s)")
+                        elif status in ("failed", "skipped"):
+                            stage_placeholders[name].error(f"⚠️ {label}: {payload}")
+                    
+                    results, errors = pipeline.run(on_event=show_stage_event)
+                    
+                    st.session_state.improved_resume = results.get(
+                        "improved_resume",
+                        {"error": f"ATS resume creation failed: {errors.get('improved_resume')}"}
+                    )
+                    # Answers whose sections kept the untailored draft are not applied yet, so
+                    # refining compares against these and retries them
+                    st.session_state.applied_responses = committed_responses(
+                        {}, user_responses, st.session_state.improved_resume, section_failures
+                    )
+                    st.session_state.failed_resume_sections = list(section_failures)
+                    if "interview_questions" in pipeline.stages:
+                        st.session_state.interview_questions = results.get("interview_questions")
+                    else:
+                        st.session_state.interview_questions = embedded_questions
+                    st.session_state.interview_questions_stale = False
+                    
+                    st.success("✅ Your optimized resume is ready!")
                     st.rerun()
                 else:
                     st.error("⚠️ Please fill in at least the career objective and achievements fields.")
@@ -1874,20 +4286,119 @@ def main():
                 help="Paste the job posting details for maximum relevance"
             )
             
+            def stream_cover_letter(heading, job_description="", company_name=""):
+                """Stream a cover letter into the page and keep whatever text arrived"""
+                st.markdown(f"#### {heading}")
+                stream = assessment_system.generate_cover_letter(
+                    st.session_state.improved_resume,
+                    st.session_state.user_responses,
+                    job_description,
+                    company_name,
+                    stream=True
+                )
+                # If the user interacts mid-stream Streamlit stops this run and the stream is
+                # closed, so nothing is stored and the letter is requested again on the next run.
+                cover_letter = write_text_stream(stream)
+                if stream.error is not None:
+                    if cover_letter:
+                        st.warning(f"⚠️ The cover letter was cut short ({stream.error}). You can regenerate it below.")
+                    else:
+                        cover_letter = f"Cover letter generation failed: {str(stream.error)}"
+                st.session_state.cover_letter = cover_letter
+                return stream.error is None
+            
             if regenerate_cover_letter:
                 if company_name or job_description:
-                    with st.spinner("📝 Creating your targeted cover letter..."):
-                        targeted_cover_letter = assessment_system.generate_cover_letter(
-                            st.session_state.improved_resume,
-                            st.session_state.user_responses,
-                            job_description,
-                            company_name
-                        )
-                        st.session_state.cover_letter = targeted_cover_letter
+                    if stream_cover_letter("📝 Creating your targeted cover letter...", job_description, company_name):
                         st.success("✅ Targeted cover letter generated!")
                         st.rerun()
                 else:
                     st.warning("⚠️ Please provide either a company name or job description for targeting.")
+            elif 'cover_letter' not in st.session_state:
+                if stream_cover_letter("📝 Creating your personalized cover letter..."):
+                    st.rerun()
+            
+            # Edit answers: only the resume sections fed by changed answers are regenerated
+            if st.session_state.get('failed_resume_sections'):
+                st.warning(
+                    f"⚠️ Some sections are not tailored to your answers yet: "
+                    f"{', '.join(st.session_state.failed_resume_sections)}. "
+                    "Submit \"Refine your answers\" again to retry them."
+                )
+            with st.expander("✏️ Refine your answers"):
+                with st.form("refine_answers_form"):
+                    current = st.session_state.user_responses
+                    refine_col1, refine_col2 = st.columns(2)
+                    with refine_col1:
+                        new_objective = st.text_area("🎯 Career objective", current.get('career_objective', ''), height=100)
+                        new_skills = st.text_area("💻 Additional skills", current.get('skills_to_add', ''), height=80)
+                        new_industry = st.selectbox(
+                            "🏢 Target Industry", TARGET_INDUSTRIES,
+                            index=TARGET_INDUSTRIES.index(current['target_industry']) if current.get('target_industry') in TARGET_INDUSTRIES else 0
+                        )
+                        new_company_size = st.selectbox(
+                            "🏭 Company Size Preference", COMPANY_SIZES,
+                            index=COMPANY_SIZES.index(current['company_size']) if current.get('company_size') in COMPANY_SIZES else 0
+                        )
+                    with refine_col2:
+                        new_achievements = st.text_area("🏆 Achievements", current.get('achievements', ''), height=100)
+                        new_projects = st.text_area("🚀 Recent projects", current.get('recent_projects', ''), height=80)
+                        new_level = st.selectbox(
+                            "📈 Target Position Level", TARGET_LEVELS,
+                            index=TARGET_LEVELS.index(current['target_level']) if current.get('target_level') in TARGET_LEVELS else 0
+                        )
+                    refine_submitted = st.form_submit_button("🔁 Update My Resume", use_container_width=True)
+                
+                if refine_submitted:
+                    new_responses = dict(current, **{
+                        'career_objective': new_objective,
+                        'achievements': new_achievements,
+                        'skills_to_add': new_skills,
+                        'recent_projects': new_projects,
+                        'target_industry': new_industry,
+                        'target_level': new_level,
+                        'company_size': new_company_size,
+                    })
+                    resume = st.session_state.improved_resume
+                    # Answers whose sections failed last time are not applied, so they count as changed
+                    applied = st.session_state.get('applied_responses', current)
+                    if not isinstance(resume, dict) or "error" in resume:
+                        st.error("⚠️ There is no generated resume to update. Start over to build a new one.")
+                    else:
+                        changed_sections = affected_resume_sections(applied, new_responses, resume)
+                        if not changed_sections:
+                            st.info("Nothing changed, your resume is already up to date.")
+                        else:
+                            section_placeholders = {path: st.empty() for path in changed_sections}
+                        
+                            def show_section_event(path, status, payload):
+                                if status == "running":
+                                    section_placeholders[path].info(f"⚙️ Rewriting {path}...")
+                                elif status == "done":
+                                    section_placeholders[path].success(f"✅ {path} ({payload:.1f}s)")
+                                elif status in ("failed", "skipped"):
+                                    section_placeholders[path].error(f"⚠️ {path}: {payload}")
+                        
+                            updated_resume, regenerated, section_errors = assessment_system.update_resume_sections(
+                                resume,
+                                st.session_state.assessment,
+                                applied,
+                                new_responses,
+                                on_event=show_section_event
+                            )
+                            st.session_state.improved_resume = updated_resume
+                            st.session_state.user_responses = new_responses
+                            st.session_state.applied_responses = committed_responses(
+                                applied, new_responses, resume, section_errors
+                            )
+                            st.session_state.failed_resume_sections = list(section_errors)
+                            if (new_responses.get('skills_to_add') or '') != (current.get('skills_to_add') or ''):
+                                st.session_state.interview_questions_stale = True
+                            # Artifacts built from the old resume are stale now
+                            for stale_key in ('cover_letter', 'portfolio_html'):
+                                if stale_key in st.session_state:
+                                    del st.session_state[stale_key]
+                            st.rerun()
             
             # Downloads
             col1, col2, col3, col4, col5 = st.columns(5)
@@ -1900,14 +4411,11 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
                 
-                pdf_buffer = create_resume_pdf(st.session_state.improved_resume)
-                
-                st.download_button(
-                    label="📥 Resume",
-                    data=pdf_buffer.getvalue(),
+                deferred_download_button(
+                    'resume_pdf', "⚙️ Prepare Resume", "📥 Resume",
+                    create_resume_pdf, (st.session_state.improved_resume,),
                     file_name=f"resume_{datetime.now().strftime('%Y%m%d')}.pdf",
-                    mime="application/pdf",
-                    use_container_width=True
+                    mime="application/pdf"
                 )
             
             with col2:
@@ -1918,10 +4426,11 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
                 
-                if hasattr(st.session_state, 'cover_letter'):
+                cover_letter = st.session_state.get('cover_letter')
+                if cover_letter is not None:
                     st.download_button(
                         label="📥 Cover Letter",
-                        data=st.session_state.cover_letter,
+                        data=cover_letter,
                         file_name=f"cover_letter_{datetime.now().strftime('%Y%m%d')}.txt",
                         mime="text/plain",
                         use_container_width=True
@@ -1937,17 +4446,12 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
                 
-                report_buffer = create_assessment_report_pdf(
-                    st.session_state.assessment,
-                    st.session_state.interview_questions
-                )
-                
-                st.download_button(
-                    label="📥 Report",
-                    data=report_buffer.getvalue(),
+                deferred_download_button(
+                    'report_pdf', "⚙️ Prepare Report", "📥 Report",
+                    create_assessment_report_pdf,
+                    (st.session_state.assessment, st.session_state.interview_questions),
                     file_name=f"assessment_{datetime.now().strftime('%Y%m%d')}.pdf",
-                    mime="application/pdf",
-                    use_container_width=True
+                    mime="application/pdf"
                 )
             
             with col4:
@@ -1967,10 +4471,11 @@ def main():
                         st.session_state.portfolio_html = portfolio_html
                         st.success("Portfolio created!")
                 
-                if hasattr(st.session_state, 'portfolio_html'):
+                portfolio_html = st.session_state.get('portfolio_html')
+                if portfolio_html is not None:
                     st.download_button(
                         label="📥 Portfolio",
-                        data=st.session_state.portfolio_html,
+                        data=portfolio_html,
                         file_name=f"portfolio_{datetime.now().strftime('%Y%m%d')}.html",
                         mime="text/html",
                         use_container_width=True
@@ -1985,26 +4490,43 @@ def main():
                 """, unsafe_allow_html=True)
                 
                 if st.button("🆕 New Resume", type="secondary", use_container_width=True):
+                    if 'speculation' in st.session_state:
+                        st.session_state.speculation.discard()
                     # Clear all session state
                     for key in list(st.session_state.keys()):
                         del st.session_state[key]
                     st.rerun()
             
             # Preview Sections
-            if hasattr(st.session_state, 'cover_letter'):
+            if cover_letter is not None:
                 with st.expander("📝 Preview Your Cover Letter"):
-                    st.text_area("Cover Letter Content", st.session_state.cover_letter, height=400)
+                    st.text_area("Cover Letter Content", cover_letter, height=400)
             
             # Portfolio Preview
-            if hasattr(st.session_state, 'portfolio_html'):
+            if portfolio_html is not None:
                 with st.expander("🌐 Preview Your Portfolio Website"):
-                    st.components.v1.html(st.session_state.portfolio_html, height=600, scrolling=True)
+                    st.components.v1.html(portfolio_html, height=600, scrolling=True)
             
             # Expandable sections for preview
             with st.expander("👀 Preview Your Optimized Resume Data"):
                 st.json(st.session_state.improved_resume)
             
             # Show interview questions
+            if st.session_state.interview_questions_stale:
+                st.info("ℹ️ Your skills changed since the interview questions were written.")
+                if st.button("🔄 Refresh Interview Questions"):
+                    with st.spinner("Generating questions for your updated skills..."):
+                        assessment = st.session_state.assessment
+                        questions = assessment_system.generate_skill_questions(
+                            assessment['current_skills'] + st.session_state.user_responses['skills_to_add'].split(','),
+                            assessment['experience_level']
+                        )
+                    if "error" in questions:
+                        st.error(f"⚠️ {questions['error']}")
+                    else:
+                        st.session_state.interview_questions = questions
+                        st.session_state.interview_questions_stale = False
+                        st.rerun()
             if st.session_state.interview_questions and "questions" in st.session_state.interview_questions:
                 with st.expander("❓ Your Personalized Interview Questions"):
                     for i, q in enumerate(st.session_state.interview_questions['questions'], 1):
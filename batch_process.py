@@ -0,0 +1,210 @@
+"""Headless bulk processing of resume PDFs.
+
+Runs the same extraction, assessment and PDF generation as the Streamlit app over a directory
+of PDFs or a JSONL manifest, with bounded concurrency and a checkpoint so an interrupted run
+picks up where it stopped.
+
+    python batch_process.py resumes/ --output-dir out/ --concurrency 8
+    python batch_process.py manifest.jsonl --output-dir out/ --base-url http://localhost:8000/v1
+
+Manifest lines look like {"id": "jane-doe", "path": "pdfs/jane.pdf"}; relative paths are
+resolved against the manifest's directory. --base-url (or OPENAI_BASE_URL) points the run at
+a local mock of the OpenAI API for testing.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def load_jobs(input_path):
+    """Return [(job_id, pdf_path)] from a directory of PDFs or a JSONL manifest"""
+    if os.path.isdir(input_path):
+        jobs = []
+        for name in sorted(os.listdir(input_path)):
+            if name.lower().endswith('.pdf'):
+                jobs.append((os.path.splitext(name)[0], os.path.join(input_path, name)))
+        return jobs
+
+    jobs = []
+    base_dir = os.path.dirname(os.path.abspath(input_path))
+    with open(input_path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if 'path' not in entry:
+                raise ValueError(f"Manifest line {line_number} has no 'path'")
+            path = entry['path']
+            if not os.path.isabs(path):
+                path = os.path.join(base_dir, path)
+            jobs.append((str(entry.get('id') or os.path.splitext(os.path.basename(path))[0]), path))
+    return jobs
+
+
+def safe_name(job_id):
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', job_id) or 'resume'
+
+
+class Checkpoint:
+    """Append-only JSONL record of finished jobs; successful ones are skipped on the next run"""
+
+    def __init__(self, path):
+        self.path = path
+        self.completed = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # A torn final line from an interrupted run
+                    if entry.get('status') == 'ok':
+                        self.completed.add(entry['id'])
+
+    def record(self, entry):
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            if entry['status'] == 'ok':
+                self.completed.add(entry['id'])
+
+
+def process_resume(system, job_id, pdf_path, output_dir, improve=True):
+    """Extract, assess and (optionally) rebuild one resume, writing its outputs to output_dir/<job_id>/"""
+    from app import create_resume_pdf
+
+    job_dir = os.path.join(output_dir, safe_name(job_id))
+    os.makedirs(job_dir, exist_ok=True)
+
+    with open(pdf_path, 'rb') as f:
+        extraction = system.extract_pdf(f)
+    resume_text, sections = extraction['text'], extraction['sections']
+    with open(os.path.join(job_dir, 'resume.txt'), 'w') as f:
+        f.write(resume_text)
+
+    assessment = system.assess_resume(resume_text, sections=sections)
+    with open(os.path.join(job_dir, 'assessment.json'), 'w') as f:
+        json.dump(assessment, f, indent=2)
+    if 'error' in assessment:
+        raise RuntimeError(assessment['error'])
+
+    result = {'overall_score': assessment.get('overall_score'), 'experience_level': assessment.get('experience_level')}
+    if extraction['normalization']['tokens_removed']:
+        result['normalized_tokens_removed'] = extraction['normalization']['tokens_removed']
+    if extraction['warnings']:
+        result['warnings'] = [warning['message'] for warning in extraction['warnings']]
+    if improve:
+        improved = system.parse_and_improve_resume(resume_text, assessment, sections=sections)
+        with open(os.path.join(job_dir, 'improved_resume.json'), 'w') as f:
+            json.dump(improved, f, indent=2)
+        if 'error' in improved:
+            raise RuntimeError(improved['error'])
+        with open(os.path.join(job_dir, 'resume.pdf'), 'wb') as f:
+            f.write(create_resume_pdf(improved).getvalue())
+    return result
+
+
+def run_batch(jobs, output_dir, concurrency=4, improve=True, resume=True, log=print):
+    """Process jobs with bounded concurrency and return the run summary"""
+    from app import ResumeAssessmentSystem
+
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(output_dir, 'checkpoint.jsonl'))
+    pending = [(job_id, path) for job_id, path in jobs if not (resume and job_id in checkpoint.completed)]
+    skipped = len(jobs) - len(pending)
+    if skipped:
+        log(f"Skipping {skipped} resume(s) already completed in a previous run")
+
+    system = ResumeAssessmentSystem()
+    succeeded, failed = 0, []
+    started = time.perf_counter()
+
+    def run_one(job_id, path):
+        job_started = time.perf_counter()
+        try:
+            result = process_resume(system, job_id, path, output_dir, improve=improve)
+            entry = {'id': job_id, 'path': path, 'status': 'ok', **result}
+        except Exception as e:
+            entry = {'id': job_id, 'path': path, 'status': 'error', 'error': str(e)}
+        entry['elapsed_seconds'] = round(time.perf_counter() - job_started, 3)
+        checkpoint.record(entry)
+        return entry
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(run_one, job_id, path) for job_id, path in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            entry = future.result()
+            if entry['status'] == 'ok':
+                succeeded += 1
+            else:
+                failed.append({'id': entry['id'], 'error': entry['error']})
+            elapsed = time.perf_counter() - started
+            log(f"[{done}/{len(pending)}] {entry['id']}: {entry['status']} "
+                f"({entry['elapsed_seconds']:.1f}s, {done / elapsed * 60:.1f} resumes/min)")
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        'total': len(jobs),
+        'processed': len(pending),
+        'skipped': skipped,
+        'succeeded': succeeded,
+        'failed': len(failed),
+        'failures': failed,
+        'elapsed_seconds': round(elapsed, 3),
+        'resumes_per_minute': round(len(pending) / elapsed * 60, 2) if pending and elapsed > 0 else 0.0,
+        'concurrency': concurrency,
+        'model_stages': system.router.stats(),
+        'circuit_breakers': system.router.breaker_stats(),
+        'hedging': system.hedger.stats(),
+        'rate_limiter': system.rate_limiter.stats(),
+        'coalescing': system.single_flight.stats(),
+        'cache': system.cache.stats() if system.cache is not None else None,
+        'extraction_cache': system.extraction_cache.stats(),
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Assess a directory or JSONL manifest of resume PDFs without the UI")
+    parser.add_argument('input', help="Directory of PDF files or a JSONL manifest of {id, path} entries")
+    parser.add_argument('--output-dir', default='batch_output', help="Where per-resume outputs, the checkpoint and summary go")
+    parser.add_argument('--concurrency', type=int, default=4, help="Resumes processed at the same time")
+    parser.add_argument('--assess-only', action='store_true', help="Skip building the improved resume and its PDF")
+    parser.add_argument('--no-resume', action='store_true', help="Reprocess resumes already completed in the checkpoint")
+    parser.add_argument('--base-url', help="OpenAI-compatible API base URL, e.g. a local mock server")
+    args = parser.parse_args(argv)
+
+    if args.base_url:
+        os.environ['OPENAI_BASE_URL'] = args.base_url
+    # The app module configures Streamlit on import; its warnings are noise outside `streamlit run`
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+    jobs = load_jobs(args.input)
+    if not jobs:
+        parser.error(f"No resumes found in {args.input}")
+
+    summary = run_batch(
+        jobs,
+        args.output_dir,
+        concurrency=args.concurrency,
+        improve=not args.assess_only,
+        resume=not args.no_resume
+    )
+    print(f"Done: {summary['succeeded']} succeeded, {summary['failed']} failed, {summary['skipped']} skipped "
+          f"in {summary['elapsed_seconds']:.1f}s ({summary['resumes_per_minute']} resumes/min)")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
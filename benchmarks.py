@@ -0,0 +1,162 @@
+"""Micro-benchmarks for the CPU-bound parts of the app.
+
+    python benchmarks.py extraction --pages 1 10 100
+    python benchmarks.py rendering --repeat 50
+
+extraction: compares the original page loop (`text +=`), in-process extraction with a join,
+and sandboxed extraction in one worker process or split over several, over synthetic
+resume-like PDFs of the given page counts.
+
+rendering: time and peak memory allocated per create_resume_pdf / create_assessment_report_pdf
+call, rebuilding the stylesheet on every render (the old behaviour) versus reusing the shared
+style registry.
+"""
+import argparse
+import io
+import logging
+import statistics
+import time
+import tracemalloc
+
+import PyPDF2
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from pdf_extraction import extract_text
+
+SAMPLE_LINES = [
+    "Senior Software Engineer, Acme Corp (2019 - Present)",
+    "• Led migration of 40 services to Kubernetes, cutting infrastructure cost by 30%",
+    "• Built REST APIs in Python and Django serving 2M monthly active users",
+    "• Mentored 6 engineers and introduced code review guidelines adopted company-wide",
+    "Skills: Python, Go, PostgreSQL, Redis, AWS, Docker, Terraform, CI/CD",
+]
+
+
+def make_pdf(pages, lines_per_page=45):
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    for page in range(pages):
+        y = 750
+        for line in range(lines_per_page):
+            pdf.drawString(40, y, f"{SAMPLE_LINES[line % len(SAMPLE_LINES)]} [{page + 1}.{line + 1}]")
+            y -= 15
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def extract_legacy(data):
+    """The original extract_text_from_pdf loop"""
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+    text = ""
+    for page in pdf_reader.pages:
+        text += page.extract_text() + "\n"
+    return text
+
+
+def time_call(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def bench_extraction(page_counts, repeat):
+    extract_text(make_pdf(1))  # Boot a worker outside the timed region
+    print(f"{'pages':>6} {'variant':<15} {'median s':>10} {'ms/page':>9}")
+    for pages in page_counts:
+        variants = [
+            ("legacy +=", extract_legacy),
+            ("inline join", lambda data: extract_text(data, sandbox=False, max_pages=pages)),
+            ("1 worker", lambda data: extract_text(data, parallel_threshold=float('inf'), max_pages=pages)),
+            ("split workers", lambda data: extract_text(data, parallel_threshold=1, max_pages=pages)),
+        ]
+        data = make_pdf(pages)
+        expected = extract_legacy(data)
+        for name, fn in variants:
+            assert fn(data) == expected, f"{name} output differs from the original extractor"
+            seconds = time_call(lambda: fn(data), repeat)
+            print(f"{pages:>6} {name:<15} {seconds:>10.4f} {seconds / pages * 1000:>9.2f}")
+
+
+SAMPLE_RESUME = {
+    "personal_info": {"name": "Jane Doe", "email": "jane@example.com", "phone": "555-0100", "location": "Berlin"},
+    "professional_summary": "Backend engineer with eight years of experience building Python services. " * 3,
+    "experience": [
+        {"title": "Senior Software Engineer", "company": "Acme Corp", "duration": "2019 - Present",
+         "achievements": [line.lstrip("• ") for line in SAMPLE_LINES[1:4]] * 2}
+    ] * 3,
+    "education": [{"degree": "BSc Computer Science", "institution": "TU Berlin", "year": "2015"}],
+    "skills": {"technical": ["Python", "Go", "PostgreSQL", "AWS"], "soft": ["Mentoring"]},
+    "certifications": ["AWS Solutions Architect"],
+}
+SAMPLE_ASSESSMENT = {
+    "overall_score": 7, "experience_level": "Senior Level",
+    "strengths": ["Quantified impact", "Clear progression"],
+    "areas_for_improvement": ["Summary is generic"],
+    "missing_skills": ["Kubernetes"],
+}
+SAMPLE_QUESTIONS = {"questions": [
+    {"question": "How did you plan the Kubernetes migration?", "type": "technical", "skill_area": "Kubernetes"}
+] * 5}
+
+
+def measure_render(fn, repeat, before_each=None):
+    """Median seconds per call, and mean KiB allocated at peak per call (measured in a second pass)"""
+    timings, peaks = [], []
+    for _ in range(repeat):
+        if before_each:
+            before_each()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    for _ in range(repeat):
+        if before_each:
+            before_each()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn()
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return statistics.median(timings), statistics.mean(peaks) / 1024
+
+
+def bench_rendering(repeat):
+    # app configures Streamlit on import; its bare-mode warnings are noise here
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    import app
+
+    renders = [
+        ("resume", lambda: app.create_resume_pdf(SAMPLE_RESUME)),
+        ("report", lambda: app.create_assessment_report_pdf(SAMPLE_ASSESSMENT, SAMPLE_QUESTIONS)),
+    ]
+    print(f"{'pdf':<7} {'styles':<9} {'median ms':>10} {'peak KiB':>9}")
+    for name, render in renders:
+        render()  # Import-time and font caches outside the measurements
+        for variant, before_each in (("per call", app.get_pdf_styles.cache_clear), ("shared", None)):
+            seconds, peak = measure_render(render, repeat, before_each)
+            print(f"{name:<7} {variant:<9} {seconds * 1000:>10.2f} {peak:>9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    extraction = subparsers.add_parser('extraction', help="PDF text extraction strategies")
+    extraction.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100])
+    extraction.add_argument('--repeat', type=int, default=3)
+    rendering = subparsers.add_parser('rendering', help="PDF rendering with per-call vs shared styles")
+    rendering.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    if args.benchmark == 'extraction':
+        bench_extraction(args.pages, args.repeat)
+    elif args.benchmark == 'rendering':
+        bench_rendering(args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Process-wide metrics registry and its Prometheus exporters.
+
+Lives outside app.py because `streamlit run` executes the script in a fresh __main__ on every
+rerun: a registry defined there would be replaced each time, while the cached assessment
+system and the exporter threads kept the first one. An imported module is loaded once per
+process, so every rerun, session and exporter shares METRICS.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside the bucket that contains it"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets):
+            if seen + self.counts[i] >= target:
+                fraction = (target - seen) / self.counts[i] if self.counts[i] else 0.0
+                return lower + (bound - lower) * fraction
+            seen += self.counts[i]
+            lower = bound
+        return self.buckets[-1]
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120)
+
+class MetricsRegistry:
+    """In-memory counters and histograms keyed by metric name and labels, rendered as Prometheus text"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+
+    @staticmethod
+    def _labels_key(labels):
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = self._labels_key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = self._labels_key(labels)
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def quantile(self, name, q, min_count=1, **labels):
+        """Estimated quantile of one series, or None until it has min_count observations"""
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(self._labels_key(labels))
+            if histogram is None or histogram.count < min_count:
+                return None
+            return histogram.quantile(q)
+
+    def histogram_summary(self, name):
+        """Per-label-set count, mean and p50/p95 for display"""
+        rows = []
+        with self._lock:
+            for key, histogram in sorted(self._histograms.get(name, {}).items()):
+                rows.append({
+                    **dict(key),
+                    "count": histogram.count,
+                    "avg": round(histogram.sum / histogram.count, 3) if histogram.count else None,
+                    "p50": round(histogram.quantile(0.5), 3) if histogram.count else None,
+                    "p95": round(histogram.quantile(0.95), 3) if histogram.count else None,
+                })
+        return rows
+
+    def counter_values(self, name):
+        with self._lock:
+            return [{**dict(key), "value": value} for key, value in sorted(self._counters.get(name, {}).items())]
+
+    def render_prometheus(self):
+        def fmt_labels(key, extra=()):
+            pairs = list(key) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{fmt_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{fmt_labels(key, [('le', str(bound))])} {cumulative}")
+                    lines.append(f"{name}_bucket{fmt_labels(key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{fmt_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{fmt_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path):
+        """Atomically write the Prometheus text exposition (e.g. for node_exporter's textfile collector)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+METRICS = MetricsRegistry()
+
+def start_metrics_exporters(registry):
+    """Expose registry on METRICS_PORT (/metrics) and/or rewrite METRICS_FILE every METRICS_FILE_INTERVAL seconds"""
+    port = os.getenv('METRICS_PORT')
+    if port:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer(('0.0.0.0', int(port)), MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        except OSError as e:
+            logger.warning("Metrics endpoint not started: %s", e)
+
+    path = os.getenv('METRICS_FILE')
+    if path:
+        interval = float(os.getenv('METRICS_FILE_INTERVAL', '15'))
+
+        def write_periodically():
+            while True:
+                try:
+                    registry.write_file(path)
+                except OSError as e:
+                    logger.warning("Could not write metrics file: %s", e)
+                time.sleep(interval)
+
+        threading.Thread(target=write_periodically, name="metrics-file", daemon=True).start()
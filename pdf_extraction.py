@@ -0,0 +1,348 @@
+"""PDF text extraction in resource-limited worker processes.
+
+Kept free of Streamlit so worker processes only need this module. Under `streamlit run`,
+app.py is __main__, and multiprocessing would re-run it in every new worker (Streamlit,
+openai, reportlab and the page setup) before any parsing. Workers are therefore started
+with a bare stand-in __main__ and forked from a fork server that has this module preloaded
+(spawned where there is no fork server). Parsing never runs in the app process, so a
+malformed or enormous upload can exhaust a worker's memory or time budget but not the
+server's. Each extraction checks workers out for itself, so killing them on a timeout does
+not touch other sessions' extractions.
+"""
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from multiprocessing.connection import wait
+
+import PyPDF2
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; workers then run without a memory cap
+    resource = None
+
+CPU_COUNT = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', '8'))
+# Documents with at least this many pages are split across several worker processes. A split
+# costs another worker and another parse of the document structure, which only pays off with
+# spare cores (sooner the more there are), so a single core never splits.
+if os.getenv('PDF_PARALLEL_PAGE_THRESHOLD'):
+    PARALLEL_PAGE_THRESHOLD = int(os.environ['PDF_PARALLEL_PAGE_THRESHOLD'])
+elif CPU_COUNT > 1:
+    PARALLEL_PAGE_THRESHOLD = max(2 * PAGES_PER_TASK, 48 // CPU_COUNT)
+else:
+    PARALLEL_PAGE_THRESHOLD = float('inf')
+# Text this much larger than a page's body text is treated as a heading
+HEADING_SIZE_RATIO = 1.15
+
+MAX_UPLOAD_BYTES = int(float(os.getenv('PDF_MAX_UPLOAD_MB', '10')) * 1024 * 1024)
+MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '50'))
+EXTRACT_TIMEOUT_SECONDS = float(os.getenv('PDF_EXTRACT_TIMEOUT_SECONDS', '30'))
+WORKER_MEMORY_MB = int(os.getenv('PDF_WORKER_MEMORY_MB', '1024'))
+# Worker processes busy at once across all sessions; idle ones are kept warm up to this count
+MAX_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', str(min(4, CPU_COUNT))))
+
+_worker_slots = threading.BoundedSemaphore(MAX_WORKERS)
+_idle_workers = []
+_idle_lock = threading.Lock()
+
+# Not fork: the app process runs an event loop thread and HTTP connection pools
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    _context = multiprocessing.get_context('forkserver')
+    _context.set_forkserver_preload([__name__])
+else:
+    _context = multiprocessing.get_context('spawn')
+_worker_main_module = types.ModuleType('__main__')
+_start_lock = threading.Lock()
+
+
+def _limit_worker_memory(memory_mb):
+    if resource is not None and memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+class FontCueCollector:
+    """visitor_text callback that remembers each text fragment's rendered size and weight"""
+
+    def __init__(self):
+        self.fragments = []
+
+    def __call__(self, text, cm, tm, font_dict, font_size):
+        text = text.strip()
+        if not text:
+            return
+        size = font_size * (abs(tm[3] * cm[3]) or 1.0)
+        base_font = str((font_dict or {}).get('/BaseFont', ''))
+        self.fragments.append((text, size, 'Bold' in base_font or 'Black' in base_font))
+
+    def headings(self):
+        """Short fragments set larger than the page's body text, or in bold capitals"""
+        if not self.fragments:
+            return []
+        weight = {}
+        for text, size, _ in self.fragments:
+            weight[round(size, 1)] = weight.get(round(size, 1), 0) + len(text)
+        body_size = max(weight, key=weight.get)
+        return [
+            text for text, size, bold in self.fragments
+            if len(text) <= 60 and len(text.split()) <= 6
+            and (size >= body_size * HEADING_SIZE_RATIO or (bold and text.isupper()))
+        ]
+
+
+def extract_page(page):
+    """(text, heading_cues) of one PyPDF2 page"""
+    collector = FontCueCollector()
+    text = page.extract_text(visitor_text=collector) or ""
+    return text, collector.headings()
+
+
+def extract_page_range(data, start, stop):
+    """Extract pages [start, stop) of a PDF; returns [(page_number, text, seconds, heading_cues)]"""
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    pages = []
+    for page_number in range(start, min(stop, len(reader.pages))):
+        started = time.perf_counter()
+        text, headings = extract_page(reader.pages[page_number])
+        pages.append((page_number, text, time.perf_counter() - started, headings))
+    return pages
+
+
+def _worker_main(conn, memory_mb):
+    """Child process loop: for each (data, start, stop) job send ("page", (page_number, text,
+    seconds, heading_cues)) for pages [start, stop), then ("done", None), or ("error", exception).
+
+    A job with stop None first reports ("count", pages) and receives the page it should stop
+    at, so the parent can hand the rest of a long document to other workers.
+    """
+    _limit_worker_memory(memory_mb)
+    while True:
+        try:
+            data, start, stop = conn.recv()
+        except EOFError:
+            return
+        try:
+            reader = PyPDF2.PdfReader(io.BytesIO(data))
+            if stop is None:
+                conn.send(("count", len(reader.pages)))
+                stop = conn.recv()
+            for page_number in range(start, min(stop, len(reader.pages))):
+                started = time.perf_counter()
+                text, headings = extract_page(reader.pages[page_number])
+                conn.send(("page", (page_number, text, time.perf_counter() - started, headings)))
+            conn.send(("done", None))
+        except Exception as e:
+            try:
+                conn.send(("error", e))
+            except Exception:
+                conn.send(("error", RuntimeError(str(e))))
+
+
+def _start_process(process):
+    """process.start() with __main__ masked, so the child does not import the app script"""
+    with _start_lock:
+        main = sys.modules.get('__main__')
+        sys.modules['__main__'] = _worker_main_module
+        try:
+            process.start()
+        finally:
+            # Leave it alone if Streamlit installed a new script module in the meantime
+            if sys.modules.get('__main__') is _worker_main_module:
+                sys.modules['__main__'] = main
+
+
+class _Worker:
+    """A worker process and the parent's end of its pipe; used by one extraction at a time"""
+
+    def __init__(self):
+        self.conn, child_conn = _context.Pipe()
+        self.process = _context.Process(target=_worker_main, args=(child_conn, WORKER_MEMORY_MB), daemon=True)
+        _start_process(self.process)
+        child_conn.close()
+        self.finished = self.failed = False
+
+    def submit(self, data, start, stop):
+        self.finished = self.failed = False
+        self.conn.send((data, start, stop))
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+def _checkout_worker(data, start, stop):
+    """A warm idle worker (or a new one) running the given job"""
+    with _idle_lock:
+        worker = _idle_workers.pop() if _idle_workers else None
+    if worker is not None:
+        try:
+            worker.submit(data, start, stop)
+            return worker
+        except OSError:
+            worker.kill()  # Died while idle
+    worker = _Worker()
+    worker.submit(data, start, stop)
+    return worker
+
+
+def _release_worker(worker, reusable):
+    """Return a worker that finished its job cleanly to the idle set; kill any other"""
+    if reusable and worker.process.is_alive():
+        with _idle_lock:
+            if len(_idle_workers) < MAX_WORKERS:
+                _idle_workers.append(worker)
+                return
+    worker.kill()
+    if not reusable:
+        # Boot a replacement in the background so the next upload does not pay for it
+        with _idle_lock:
+            if len(_idle_workers) < MAX_WORKERS:
+                _idle_workers.append(_Worker())
+
+
+def iter_pdf_pages(data, parallel_threshold=None, max_pages=None, timeout=None, max_bytes=None, summary=None):
+    """Yield (page_number, text, seconds, heading_cues) in page order as the workers read them.
+
+    Parsing runs in the extraction's own worker process(es) within the upload, page and time
+    limits; summary, if given, receives "page_count", "pages_to_read" and "warnings" as they
+    become known. Hitting the page cap, the deadline or a worker failure part-way ends the
+    pages early and adds a {"limit", "message"} warning; failing before any page is read
+    raises. Uploads over max_bytes are rejected with ValueError before parsing. Closing the
+    generator early releases the workers.
+    """
+    parallel_threshold = PARALLEL_PAGE_THRESHOLD if parallel_threshold is None else parallel_threshold
+    max_pages = MAX_PAGES if max_pages is None else max_pages
+    timeout = EXTRACT_TIMEOUT_SECONDS if timeout is None else timeout
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    summary = {} if summary is None else summary
+    summary.update(page_count=None, pages_to_read=None, warnings=[])
+    if len(data) > max_bytes:
+        raise ValueError(
+            f"The file is {len(data) / 1024 / 1024:.1f} MB; the limit is {max_bytes / 1024 / 1024:.0f} MB"
+        )
+
+    deadline = time.monotonic() + timeout
+
+    def remaining():
+        return max(0.0, deadline - time.monotonic())
+
+    if not _worker_slots.acquire(timeout=remaining()):
+        raise RuntimeError("The PDF reader is busy; please try again in a moment")
+    workers = []
+    try:
+        workers.append(_checkout_worker(data, 0, None))
+        yield from _collect_pages(workers, data, parallel_threshold, max_pages, remaining, summary)
+    finally:
+        for worker in workers:
+            # Unfinished workers may still be parsing (deadline, early close) or be broken (error)
+            _release_worker(worker, worker.finished and not worker.failed)
+        # One slot per worker (the first one's slot is held even if it failed to start)
+        for _ in range(max(1, len(workers))):
+            _worker_slots.release()
+
+
+def extract_pages(data, parallel_threshold=None, max_pages=None, timeout=None, max_bytes=None):
+    """All pages of iter_pdf_pages at once: {"pages": [...], "page_count", "pages_to_read", "warnings"}"""
+    summary = {}
+    pages = list(iter_pdf_pages(data, parallel_threshold, max_pages, timeout, max_bytes, summary))
+    return {"pages": pages, **summary}
+
+
+def _collect_pages(workers, data, parallel_threshold, max_pages, remaining, summary):
+    pages, failure = {}, None
+    pages_to_read = None
+    next_page = 0
+
+    while not all(worker.finished for worker in workers):
+        ready = wait([worker.conn for worker in workers if not worker.finished], timeout=remaining())
+        if not ready:
+            break  # Deadline; the unfinished workers are killed by the caller
+        for conn in ready:
+            worker = next(worker for worker in workers if worker.conn is conn)
+            try:
+                kind, payload = conn.recv()
+            except (EOFError, OSError):
+                # Killed by its memory limit or a crash in the parser
+                kind, payload = "error", RuntimeError("The PDF parser stopped unexpectedly")
+                worker.failed = True
+            if kind == "count":
+                pages_to_read = min(payload, max_pages)
+                summary.update(page_count=payload, pages_to_read=pages_to_read)
+                if payload > max_pages:
+                    summary["warnings"].append({
+                        "limit": "pages",
+                        "message": f"This PDF has {payload} pages; only the first {max_pages} were read.",
+                    })
+                leader_stop = pages_to_read
+                if pages_to_read >= parallel_threshold:
+                    leader_stop = _start_helpers(workers, data, pages_to_read)
+                conn.send(leader_stop)
+            elif kind == "page":
+                pages[payload[0]] = payload
+            elif kind == "done":
+                worker.finished = True
+            else:
+                worker.finished = worker.failed = True
+                failure = failure or payload
+        # Only an unbroken run from the first page is useful text, so pages go out in order
+        while next_page in pages:
+            yield pages.pop(next_page)
+            next_page += 1
+
+    if pages_to_read is not None and next_page == pages_to_read:
+        return
+    if not next_page:
+        if failure is not None:
+            raise failure
+        raise RuntimeError("Reading the PDF took too long; it may be damaged or unusually complex")
+    if failure is not None:
+        summary["warnings"].append({
+            "limit": "worker_error",
+            "message": f"Reading stopped after {next_page} of {pages_to_read} pages: {failure}",
+        })
+    else:
+        summary["warnings"].append({
+            "limit": "timeout",
+            "message": f"Reading stopped after {next_page} of {pages_to_read} pages because it took too long.",
+        })
+
+
+def _start_helpers(workers, data, pages_to_read):
+    """Split a long document over extra workers from the free slots; returns the page the first
+    worker stops at. One extraction uses at most half the workers, so other uploads never
+    queue behind a long document."""
+    ranges = [(start, min(start + PAGES_PER_TASK, pages_to_read)) for start in range(0, pages_to_read, PAGES_PER_TASK)]
+    max_helpers = min(len(ranges), (MAX_WORKERS + 1) // 2) - 1
+    helpers = 0
+    while helpers < max_helpers and _worker_slots.acquire(blocking=False):
+        helpers += 1
+    if not helpers:
+        return pages_to_read
+    # Contiguous shares, so the first worker's pages (the start of the resume) arrive first
+    share = -(-len(ranges) // (helpers + 1))
+    groups = [ranges[i:i + share] for i in range(0, len(ranges), share)]
+    started = 0
+    try:
+        for group in groups[1:]:
+            workers.append(_checkout_worker(data, group[0][0], group[-1][1]))
+            started += 1
+    finally:
+        for _ in range(helpers - started):
+            _worker_slots.release()
+    return groups[0][-1][1] if started else pages_to_read
+
+
+def extract_text(data, parallel_threshold=None, sandbox=True, max_pages=None):
+    """Full text of a PDF, one newline-terminated block per page; sandbox=False parses in-process"""
+    if sandbox:
+        pages = extract_pages(data, parallel_threshold, max_pages=max_pages)["pages"]
+    else:
+        pages = extract_page_range(data, 0, MAX_PAGES if max_pages is None else max_pages)
+    return "".join(page[1] + "\n" for page in pages)
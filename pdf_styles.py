@@ -0,0 +1,44 @@
+"""Paragraph styles of the generated PDFs.
+
+Kept out of app.py: `streamlit run` executes that script afresh on every rerun, which would
+start the style cache over each time, while an imported module is loaded once per process.
+"""
+import functools
+from types import MappingProxyType
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+# Custom paragraph styles of each PDF template: name -> (sample stylesheet parent, attributes)
+PDF_STYLE_DEFINITIONS = {
+    'resume': {
+        'CustomTitle': ('Heading1', dict(
+            fontSize=24, spaceAfter=6, alignment=TA_CENTER, textColor=colors.HexColor('#2C3E50')
+        )),
+        'CustomHeading': ('Heading2', dict(
+            fontSize=14, spaceAfter=6, spaceBefore=12, textColor=colors.HexColor('#2C3E50'),
+            borderWidth=1, borderColor=colors.HexColor('#3498DB'), borderPadding=3
+        )),
+        'ContactStyle': ('Normal', dict(fontSize=11, alignment=TA_CENTER, spaceAfter=12)),
+        'BodyStyle': ('Normal', dict(fontSize=11, spaceAfter=6, alignment=TA_JUSTIFY)),
+        'BulletStyle': ('Normal', dict(fontSize=10, spaceAfter=3, leftIndent=20, bulletIndent=10)),
+    },
+    'assessment_report': {
+        'ReportTitle': ('Title', dict(fontSize=20, spaceAfter=30, alignment=TA_CENTER)),
+    },
+}
+
+@functools.lru_cache(maxsize=None)
+def get_pdf_styles(template, pagesize=letter):
+    """Sample stylesheet plus a template's custom styles, built once per process.
+
+    The mapping is read-only and shared by every render and thread; the styles in it must not
+    be modified either. pagesize is part of the key for templates that size text to the page.
+    """
+    sample = getSampleStyleSheet()
+    styles = {name: sample[name] for name in sample.byName}
+    for name, (parent, attributes) in PDF_STYLE_DEFINITIONS[template].items():
+        styles[name] = ParagraphStyle(name, parent=sample[parent], **attributes)
+    return MappingProxyType(styles)
@@ -0,0 +1,13 @@
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py builds its OpenAI client and caches from the environment; keep the tests off the
+# network and off the on-disk caches
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ['LLM_CACHE_PATH'] = ''
+os.environ['EXTRACTION_CACHE_PATH'] = ''
+# The app module configures Streamlit on import; its warnings are noise outside `streamlit run`
+logging.getLogger('streamlit').setLevel(logging.ERROR)
@@ -0,0 +1,156 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from reportlab.pdfgen import canvas
+
+import batch_process
+from batch_process import Checkpoint, load_jobs, run_batch
+
+ASSESSMENT = {
+    "overall_score": 7,
+    "strengths": ["Clear structure"],
+    "improvements": ["Quantify achievements"],
+    "missing_sections": [],
+    "current_skills": ["Python", "SQL"],
+    "recommended_skills": ["AWS"],
+    "experience_level": "Mid",
+    "format_feedback": "Consistent formatting",
+}
+
+IMPROVED_RESUME = {
+    "personal_info": {"name": "Jane Doe", "email": "jane@example.com"},
+    "professional_summary": "Backend engineer.",
+    "experience": [{"title": "Engineer", "company": "Acme", "duration": "2020-2023",
+                    "achievements": ["Cut API latency by 30%"]}],
+    "education": [],
+    "skills": {"technical": ["Python"]},
+    "projects": [],
+    "achievements": [],
+}
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers chat completions with a canned assessment or improved resume"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = " ".join(message['content'] for message in body['messages'])
+        content = IMPROVED_RESUME if 'personal_info' in prompt else ASSESSMENT
+        data = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": body['model'],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps(content)},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def openai_stub(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubOpenAIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('OPENAI_BASE_URL', f'http://127.0.0.1:{server.server_address[1]}/v1')
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+def write_resume_pdf(path, name):
+    pdf = canvas.Canvas(str(path))
+    lines = [name, "jane@example.com", "", "Experience", "Engineer, Acme 2020-2023",
+             "Built Python services handling 1M requests a day", "", "Skills", "Python, SQL, Docker"]
+    for i, line in enumerate(lines):
+        pdf.drawString(72, 720 - 16 * i, line)
+    pdf.save()
+
+
+def test_load_jobs_from_directory(tmp_path):
+    for name in ('b.pdf', 'a.PDF', 'notes.txt'):
+        (tmp_path / name).write_bytes(b'')
+
+    assert load_jobs(str(tmp_path)) == [('a', str(tmp_path / 'a.PDF')), ('b', str(tmp_path / 'b.pdf'))]
+
+
+def test_load_jobs_from_manifest(tmp_path):
+    manifest = tmp_path / 'manifest.jsonl'
+    manifest.write_text(
+        '{"id": "jane", "path": "pdfs/jane.pdf"}\n'
+        '\n'
+        '{"path": "/abs/john.pdf"}\n'
+    )
+
+    assert load_jobs(str(manifest)) == [('jane', str(tmp_path / 'pdfs' / 'jane.pdf')), ('john', '/abs/john.pdf')]
+
+
+def test_load_jobs_rejects_manifest_line_without_path(tmp_path):
+    manifest = tmp_path / 'manifest.jsonl'
+    manifest.write_text('{"id": "jane"}\n')
+
+    with pytest.raises(ValueError, match="line 1"):
+        load_jobs(str(manifest))
+
+
+def test_checkpoint_only_counts_successful_jobs_and_skips_torn_lines(tmp_path):
+    path = tmp_path / 'checkpoint.jsonl'
+    checkpoint = Checkpoint(str(path))
+    checkpoint.record({'id': 'a', 'status': 'ok'})
+    checkpoint.record({'id': 'b', 'status': 'error', 'error': 'boom'})
+    with open(path, 'a') as f:
+        f.write('{"id": "c", "stat')  # Killed halfway through a write
+
+    assert Checkpoint(str(path)).completed == {'a'}
+
+
+def test_run_batch_resumes_after_interrupt(tmp_path, openai_stub, monkeypatch):
+    input_dir, output_dir = tmp_path / 'resumes', tmp_path / 'out'
+    input_dir.mkdir()
+    for name in ('alice', 'bob', 'carol'):
+        write_resume_pdf(input_dir / f'{name}.pdf', name.title())
+    jobs = load_jobs(str(input_dir))
+
+    process_resume = batch_process.process_resume
+
+    def interrupted(system, job_id, *args, **kwargs):
+        if job_id == 'bob':
+            raise KeyboardInterrupt
+        return process_resume(system, job_id, *args, **kwargs)
+
+    monkeypatch.setattr(batch_process, 'process_resume', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        run_batch(jobs, str(output_dir), concurrency=1, log=lambda message: None)
+    assert Checkpoint(str(output_dir / 'checkpoint.jsonl')).completed == {'alice', 'carol'}
+    assert not (output_dir / 'summary.json').exists()
+
+    monkeypatch.setattr(batch_process, 'process_resume', process_resume)
+    summary = run_batch(jobs, str(output_dir), concurrency=1, log=lambda message: None)
+
+    assert summary['total'] == 3
+    assert summary['skipped'] == 2
+    assert summary['processed'] == 1
+    assert summary['succeeded'] == 1
+    assert summary['failed'] == 0
+    assert json.loads((output_dir / 'summary.json').read_text()) == summary
+    assert json.loads((output_dir / 'bob' / 'assessment.json').read_text())['overall_score'] == 7
+    assert (output_dir / 'bob' / 'resume.pdf').read_bytes().startswith(b'%PDF')
+    assert Checkpoint(str(output_dir / 'checkpoint.jsonl')).completed == {'alice', 'bob', 'carol'}
+
+
+def test_run_batch_reports_failures_in_summary(tmp_path, openai_stub):
+    missing = str(tmp_path / 'missing.pdf')
+
+    summary = run_batch([('missing', missing)], str(tmp_path / 'out'), log=lambda message: None)
+
+    assert summary['succeeded'] == 0
+    assert summary['failed'] == 1
+    assert summary['failures'][0]['id'] == 'missing'
+    assert Checkpoint(str(tmp_path / 'out' / 'checkpoint.jsonl')).completed == set()
@@ -0,0 +1,204 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from app import BroadcastStream, ResumeAssessmentSystem, SingleFlight, StageGraph
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.001)
+
+
+def test_stage_graph_passes_dependency_results_and_runs_independent_stages_concurrently():
+    both_running = threading.Barrier(2, timeout=2)
+
+    def independent(value):
+        def fn(inputs, progress):
+            both_running.wait()  # Deadlocks unless the two stages overlap
+            return value
+        return fn
+
+    graph = (StageGraph(max_workers=2)
+             .add('assessment', independent(7))
+             .add('questions', independent(['Q1']))
+             .add('report', lambda inputs, progress: dict(inputs), depends_on=('assessment', 'questions')))
+
+    results, errors = graph.run(poll_interval=0.01)
+
+    assert errors == {}
+    assert results['report'] == {'assessment': 7, 'questions': ['Q1']}
+
+
+def test_stage_graph_skips_dependents_of_failed_stages():
+    def fail(inputs, progress):
+        raise RuntimeError("assessment failed")
+
+    events = []
+    graph = (StageGraph()
+             .add('assessment', fail)
+             .add('questions', lambda inputs, progress: 'ok')
+             .add('report', lambda inputs, progress: 'never', depends_on=('assessment',)))
+
+    results, errors = graph.run(on_event=lambda *event: events.append(event[:2]), poll_interval=0.01)
+
+    assert results == {'questions': 'ok'}
+    assert str(errors['assessment']) == "assessment failed"
+    assert "assessment failed" in str(errors['report'])
+    assert ('assessment', 'failed') in events
+    assert ('report', 'skipped') in events
+    assert ('report', 'running') not in events
+
+
+def test_stage_graph_emits_events_on_the_calling_thread():
+    calling_thread = threading.get_ident()
+    event_threads = set()
+    progress = []
+
+    def stage(inputs, report):
+        for i in range(3):
+            report(i)
+        return 'done'
+
+    def on_event(name, status, payload):
+        event_threads.add(threading.get_ident())
+        if status == 'progress':
+            progress.append(payload)
+
+    StageGraph().add('improve', stage).run(on_event=on_event, poll_interval=0.01)
+
+    assert event_threads == {calling_thread}
+    assert progress and progress[-1] == 2
+
+
+def test_stage_graph_rejects_unknown_dependencies():
+    with pytest.raises(ValueError, match="unknown stage 'assessment'"):
+        StageGraph().add('report', lambda inputs, progress: None, depends_on=('assessment',))
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return {'score': 7}
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flight.do, 'key', slow)
+        wait_until(lambda: calls)
+        followers = [pool.submit(flight.do, 'key', slow) for _ in range(3)]
+        wait_until(lambda: flight.coalesced == 3)
+        release.set()
+        outcomes = [future.result() for future in [leader] + followers]
+
+    assert calls == [1]
+    assert outcomes == [{'score': 7}] * 4
+    assert flight.stats() == {'requests': 4, 'coalesced': 3, 'in_flight': 0}
+    # Once finished the key is free again
+    assert flight.do('key', lambda: 'fresh') == 'fresh'
+
+
+def test_single_flight_shares_errors_with_waiting_callers():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(2)
+        raise RuntimeError("upstream failed")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, 'key', failing)
+        wait_until(lambda: flight.requests == 1)
+        follower = pool.submit(flight.do, 'key', failing)
+        wait_until(lambda: flight.coalesced == 1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="upstream failed"):
+                future.result()
+
+
+def test_broadcast_replays_earlier_chunks_to_late_subscribers():
+    broadcast = BroadcastStream()
+    broadcast.publish('Dear ')
+    early = broadcast.subscribe()
+    assert next(early) == 'Dear '
+
+    broadcast.publish('Hiring ')
+    late = broadcast.subscribe()
+    broadcast.publish('Manager')
+    broadcast.finish()
+
+    assert ''.join(early) == 'Hiring Manager'
+    assert ''.join(late) == 'Dear Hiring Manager'
+
+
+def test_broadcast_raises_the_upstream_error_after_the_partial_text():
+    broadcast = BroadcastStream()
+    broadcast.publish('partial')
+    broadcast.finish(RuntimeError("stream dropped"))
+
+    received = []
+    with pytest.raises(RuntimeError, match="stream dropped"):
+        for chunk in broadcast.subscribe():
+            received.append(chunk)
+    assert received == ['partial']
+
+
+def test_single_flight_stream_cancels_upstream_when_every_subscriber_leaves():
+    flight = SingleFlight()
+    upstream = Future()
+    starts = []
+
+    def start(broadcast):
+        starts.append(broadcast)
+        broadcast.publish('chunk')
+        return upstream
+
+    first = flight.stream('letter', start)
+    second = flight.stream('letter', start)
+    assert next(first) == next(second) == 'chunk'
+    assert len(starts) == 1
+
+    first.close()
+    assert not upstream.cancelled()
+    second.close()
+
+    assert upstream.cancelled()
+    assert flight.stats()['in_flight'] == 0
+
+
+@pytest.mark.parametrize('hedge_delay, requests', [(5, 1), (0.01, 2)])
+def test_hedged_create_cancels_its_requests_when_the_caller_is_cancelled(hedge_delay, requests):
+    started, cancelled = [], []
+
+    async def acreate(stage, request, timeout):
+        started.append(stage)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(stage)
+            raise
+
+    hedger = SimpleNamespace(delay=lambda stage, model: hedge_delay, try_hedge=lambda stage: True)
+    system = SimpleNamespace(hedger=hedger, _acreate=acreate)
+
+    async def caller():
+        task = asyncio.ensure_future(ResumeAssessmentSystem._ahedged_create(system, 'assessment', {'model': 'gpt-4'}, 30))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+        # Checked before asyncio.run's shutdown cancels whatever is still running
+        assert len(started) == requests
+        assert cancelled == started
+
+    asyncio.run(caller())
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from app import IncrementalJSONParser, parse_json_response
+
+DOCUMENT = {
+    "overall_score": 8,
+    "strengths": ["Clear \"impact\" bullets", "Relevant {stack}"],
+    "skills": {"technical": ["Python", "SQL"], "soft": []},
+    "ratio": -1.5e3,
+    "remote": True,
+    "notes": None,
+}
+
+
+def feed_in_chunks(parser, text, size):
+    snapshots = []
+    for i in range(0, len(text), size):
+        snapshot = parser.feed(text[i:i + size])
+        if snapshot is not None:
+            snapshots.append(snapshot)
+    return snapshots
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, 64])
+def test_snapshots_only_contain_completed_values(size):
+    text = json.dumps(DOCUMENT)
+    parser = IncrementalJSONParser()
+
+    snapshots = feed_in_chunks(parser, text, size)
+
+    assert snapshots[-1] == DOCUMENT
+    assert parser.result() == DOCUMENT
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            # Every value exposed early is the final value or a prefix of a final list/dict
+            if isinstance(value, list):
+                assert value == DOCUMENT[key][:len(value)]
+            elif isinstance(value, dict):
+                assert all(value[k] == DOCUMENT[key][k][:len(value[k])] for k in value)
+            else:
+                assert value == DOCUMENT[key]
+
+
+def test_snapshot_never_exposes_partial_strings_or_numbers():
+    parser = IncrementalJSONParser()
+
+    assert parser.feed('{"summary": "Senior engi') == {}
+    assert parser.feed('neer", "score": 1') == {"summary": "Senior engineer"}
+    assert parser.feed('2') is None
+    assert parser.feed(', "tags": ["a"') == {"summary": "Senior engineer", "score": 12, "tags": ["a"]}
+
+
+def test_result_ignores_prose_and_code_fences_around_the_document():
+    content = 'Here is the assessment:\n```json\n{"score": 7, "items": [1, 2]}\n```\nLet me know if {anything} else.'
+    parser = IncrementalJSONParser()
+    feed_in_chunks(parser, content, 5)
+
+    assert parser.done
+    assert parser.result() == {"score": 7, "items": [1, 2]}
+    assert parser.result() == parse_json_response(content)
+
+
+def test_result_raises_for_incomplete_or_missing_documents():
+    incomplete = IncrementalJSONParser()
+    incomplete.feed('{"score": 7, "items": [1')
+    with pytest.raises(ValueError, match="incomplete"):
+        incomplete.result()
+
+    missing = IncrementalJSONParser()
+    missing.feed('I cannot assess this resume.')
+    with pytest.raises(ValueError, match="No JSON"):
+        missing.result()
+
+
+def test_parse_json_response_accepts_top_level_arrays():
+    assert parse_json_response('Questions: [{"q": "Why?"}] done') == [{"q": "Why?"}]
+    with pytest.raises(ValueError):
+        parse_json_response('no json here')
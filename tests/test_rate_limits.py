@@ -0,0 +1,162 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app import CircuitBreaker, RateLimitScheduler
+
+REQUEST = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+
+
+def rate_limit_error(headers=None):
+    response = httpx.Response(429, headers=headers or {}, request=REQUEST)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def scheduler(**kwargs):
+    kwargs.setdefault('base_delay', 0.001)
+    kwargs.setdefault('max_delay', 0.01)
+    return RateLimitScheduler(requests_per_minute=6000, tokens_per_minute=600000, **kwargs)
+
+
+def failing_then_ok(errors):
+    """make_request callable raising each of errors in turn, then returning a raw response"""
+    calls = []
+
+    async def make_request():
+        calls.append(time.monotonic())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return SimpleNamespace(headers={})
+
+    return make_request, calls
+
+
+def test_call_retries_rate_limits_and_transient_errors():
+    limiter = scheduler()
+    make_request, calls = failing_then_ok([rate_limit_error(), openai.APIConnectionError(request=REQUEST)])
+
+    raw = asyncio.run(limiter.call(make_request, 100, stage='assessment'))
+
+    assert raw.headers == {}
+    assert len(calls) == 3
+    assert limiter.retries == 2
+
+
+def test_call_gives_up_after_max_retries():
+    limiter = scheduler(max_retries=2)
+    make_request, calls = failing_then_ok([rate_limit_error()] * 5)
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(limiter.call(make_request, 100))
+    assert len(calls) == 3
+
+
+def test_call_retries_timeouts_at_most_max_timeout_retries():
+    limiter = scheduler(max_timeout_retries=1)
+    make_request, calls = failing_then_ok([openai.APITimeoutError(request=REQUEST)] * 3)
+
+    with pytest.raises(openai.APITimeoutError):
+        asyncio.run(limiter.call(make_request, 100))
+    assert len(calls) == 2
+
+
+def test_call_does_not_retry_past_max_retry_seconds():
+    limiter = scheduler(max_delay=60, max_retry_seconds=5)
+    make_request, calls = failing_then_ok([rate_limit_error({'retry-after': '30'})])
+
+    started = time.monotonic()
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(limiter.call(make_request, 100))
+    assert len(calls) == 1
+    assert time.monotonic() - started < 1
+
+
+def test_backoff_waits_at_least_the_server_hint():
+    limiter = scheduler(max_delay=30)
+
+    assert limiter.backoff_delay(0, {'retry-after-ms': '1500'}) >= 1.5
+    assert limiter.backoff_delay(0, {'retry-after': '2'}) >= 2
+    # Hints are capped like any other delay
+    assert limiter.backoff_delay(0, {'retry-after': '600'}) == 30
+
+
+def test_reset_hint_follows_the_exhausted_quota():
+    headers = {
+        'x-ratelimit-remaining-requests': '12',
+        'x-ratelimit-remaining-tokens': '0',
+        'x-ratelimit-reset-requests': '120ms',
+        'x-ratelimit-reset-tokens': '6m0s',
+    }
+    assert RateLimitScheduler.reset_hint(headers) == 360
+
+    headers['x-ratelimit-remaining-tokens'] = '500'
+    headers['x-ratelimit-remaining-requests'] = '0'
+    assert RateLimitScheduler.reset_hint(headers) == pytest.approx(0.12)
+
+    # Nothing reported as exhausted: wait for the later of the two resets
+    del headers['x-ratelimit-remaining-requests']
+    assert RateLimitScheduler.reset_hint(headers) == 360
+    assert RateLimitScheduler.reset_hint({}) is None
+
+
+def test_headers_sync_the_buckets_and_settle_refunds_over_reservation():
+    limiter = scheduler()
+    limiter.update_from_headers({'x-ratelimit-limit-tokens': '30000', 'x-ratelimit-remaining-tokens': '1000'})
+    assert limiter.tokens.capacity == 30000
+    assert limiter.tokens.tokens <= 1001
+
+    asyncio.run(limiter.acquire(800))
+    limiter.settle(800, 300)
+    assert 690 <= limiter.tokens.tokens <= 710
+
+
+def test_acquire_waits_for_the_token_bucket_to_refill():
+    limiter = RateLimitScheduler(requests_per_minute=6000, tokens_per_minute=6000)
+    limiter.tokens.tokens = 0  # 100 tokens/second refill
+
+    started = time.monotonic()
+    asyncio.run(limiter.acquire(20))
+
+    assert time.monotonic() - started >= 0.15
+    assert limiter.throttled >= 1
+    assert limiter.queue_depth == 0
+
+
+def test_circuit_opens_after_consecutive_failures():
+    breaker = CircuitBreaker('gpt-4', failure_threshold=3, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # Resets the streak
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert not breaker.allow()
+    assert breaker.stats() == {"state": "open", "consecutive_failures": 3, "trips": 1}
+
+
+def test_half_open_circuit_lets_one_probe_through():
+    breaker = CircuitBreaker('gpt-4', failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.stats()["state"] == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # Only one probe at a time
+
+    breaker.record_failure()  # Failed probe re-opens without counting a new trip
+    assert not breaker.allow()
+    assert breaker.stats()["trips"] == 1
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "trips": 1}